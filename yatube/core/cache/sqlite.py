@@ -0,0 +1,236 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE stats SET entries = entries + 1,
+                     size = size + length(NEW.value);
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF value ON cache
+BEGIN
+    UPDATE stats SET size = size - length(OLD.value) + length(NEW.value);
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE stats SET entries = entries - 1,
+                     size = size - length(OLD.value);
+END;
+'''
+
+UPSERT = '''
+INSERT INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value,
+    expires = excluded.expires,
+    accessed = excluded.accessed
+'''
+
+# Время доступа обновляется не чаще раза в секунду на ключ:
+# для LRU этого хватает, а чтение почти не пишет в файл.
+ACCESS_RESOLUTION = 1.0
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех процессов на машине.
+
+    LOCATION — путь к файлу. Помимо MAX_ENTRIES и CULL_FREQUENCY
+    понимает OPTIONS['MAX_SIZE'] — предел суммарного размера значений
+    в байтах. При переполнении вытесняются давно не читанные записи.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._max_size = params.get('OPTIONS', {}).get('MAX_SIZE')
+        self._local = threading.local()
+
+    def _connection(self):
+        # Соединение не переживает fork: у дочернего процесса свое.
+        if getattr(self._local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=30,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def _write(self, callback):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = callback(connection)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return result
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _fetch(self, connection, keys):
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = connection.execute(
+            f'SELECT key, value, expires, accessed FROM cache '
+            f'WHERE key IN ({placeholders})', keys).fetchall()
+        found, touched = {}, []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                continue
+            found[key] = pickle.loads(value)
+            if now - accessed > ACCESS_RESOLUTION:
+                touched.append((now, key))
+        if touched:
+            connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', touched)
+        return found
+
+    def _cull(self, connection):
+        entries, size = connection.execute(
+            'SELECT entries, size FROM stats').fetchone()
+        if not self._over_limit(entries, size):
+            return
+        connection.execute('DELETE FROM cache WHERE expires <= ?',
+                           (time.time(),))
+        entries, size = connection.execute(
+            'SELECT entries, size FROM stats').fetchone()
+        while entries and self._over_limit(entries, size):
+            if self._cull_frequency == 0:
+                connection.execute('DELETE FROM cache')
+            else:
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY accessed LIMIT ?)',
+                    (max(1, entries // self._cull_frequency),))
+            entries, size = connection.execute(
+                'SELECT entries, size FROM stats').fetchone()
+
+    def _over_limit(self, entries, size):
+        return entries > self._max_entries or (
+            self._max_size is not None and size > self._max_size)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        found = self._fetch(self._connection(), [key])
+        return found.get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        if not made:
+            return {}
+        for key in made:
+            self.validate_key(key)
+        found = self._fetch(self._connection(), list(made))
+        return {made[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows.append((key, self._dumps(value), expires, now))
+
+        def write(connection):
+            connection.executemany(UPSERT, rows)
+            self._cull(connection)
+
+        self._write(write)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        row = (key, self._dumps(value), self.get_backend_timeout(timeout),
+               now, now)
+
+        def write(connection):
+            added = connection.execute(
+                UPSERT + ' WHERE cache.expires IS NOT NULL '
+                'AND cache.expires <= ?', row).rowcount
+            self._cull(connection)
+            return added == 1
+
+        return self._write(write)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()))
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def write(connection):
+            found = self._fetch(connection, [key])
+            if key not in found:
+                raise ValueError("Key '%s' not found" % key)
+            value = found[key] + delta
+            connection.execute('UPDATE cache SET value = ? WHERE key = ?',
+                               (self._dumps(value), key))
+            return value
+
+        return self._write(write)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time())).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [(self.make_key(key, version=version),) for key in keys]
+        for (key,) in keys:
+            self.validate_key(key)
+        self._write(lambda connection: connection.executemany(
+            'DELETE FROM cache WHERE key = ?', keys))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение держится на поток; закрывать его после каждого
+        # запроса значило бы заново открывать файл на каждый запрос.
+        pass
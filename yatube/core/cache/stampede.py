@@ -0,0 +1,81 @@
+import math
+import random
+import time
+import uuid
+
+from django.core.cache import cache as default_cache
+
+LOCK_KEY = '{}:lock'
+POLL_INTERVAL = 0.05
+
+
+def _is_fresh(entry, beta, validate):
+    value, expires, delta = entry
+    if validate is not None and not validate(value):
+        return False
+    # XFetch: чем дороже пересчет и ближе срок, тем вероятнее
+    # обновить значение заранее, пока его еще можно отдавать.
+    jitter = -delta * beta * math.log(1.0 - random.random())
+    return time.time() + jitter < expires
+
+
+def acquire(lock_key, lock_timeout, cache=default_cache):
+    """Токен владельца блокировки или None, если она уже занята."""
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, lock_timeout):
+        return token
+    return None
+
+
+def release(lock_key, token, cache=default_cache):
+    # Блокировка могла истечь и достаться другому: чужую не снимаем.
+    if token is not None and cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _wait_for_value(cache, key, lock_timeout):
+    deadline = time.time() + lock_timeout
+    while time.time() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if not cache.has_key(LOCK_KEY.format(key)):
+            break
+    return None
+
+
+def get_or_refresh(key, compute, timeout, stale_timeout=None,
+                   lock_timeout=30, beta=1.0, validate=None,
+                   cache=default_cache):
+    """Значение из кэша, пересчитываемое только одним процессом.
+
+    Пока владелец блокировки пересчитывает истекшее значение, остальные
+    отдают старое — не дольше stale_timeout после истечения. validate
+    позволяет объявить значение устаревшим досрочно (например, по
+    версиям пространств имен). Если compute вернул None, ничего не
+    сохраняется.
+    """
+    if stale_timeout is None:
+        stale_timeout = timeout
+    entry = cache.get(key)
+    if entry is not None and _is_fresh(entry, beta, validate):
+        return entry[0]
+    lock_key = LOCK_KEY.format(key)
+    token = acquire(lock_key, lock_timeout, cache)
+    if token is None:
+        if entry is not None:
+            return entry[0]
+        entry = _wait_for_value(cache, key, lock_timeout)
+        if entry is not None:
+            return entry[0]
+    try:
+        started = time.time()
+        value = compute()
+        finished = time.time()
+        if value is not None:
+            cache.set(key, (value, finished + timeout, finished - started),
+                      timeout + stale_timeout)
+        return value
+    finally:
+        release(lock_key, token, cache)
@@ -0,0 +1,89 @@
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db import transaction
+
+DEFAULT_PRAGMAS = {
+    # Читатели не блокируют писателя и наоборот.
+    'journal_mode': 'WAL',
+    # В WAL fsync нужен только на контрольной точке.
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — в килобайтах, то есть 64 МБ на соединение.
+    'cache_size': -64000,
+    'busy_timeout': 5000,
+}
+BUSY_ATTEMPTS = 3
+BUSY_DELAY = 0.05
+BUSY_MESSAGES = ('database is locked', 'database is busy')
+
+
+def pragmas():
+    """DEFAULT_PRAGMAS с поправками из settings.SQLITE_PRAGMAS.
+
+    Значение None в настройках отключает прагму.
+    """
+    values = dict(DEFAULT_PRAGMAS)
+    values.update(getattr(settings, 'SQLITE_PRAGMAS', {}))
+    return {name: value for name, value in values.items()
+            if value is not None}
+
+
+def apply_pragmas(cursor, values):
+    for name, value in values.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_busy(error):
+    return any(message in str(error) for message in BUSY_MESSAGES)
+
+
+def busy_timeout():
+    """busy_timeout из прагм в секундах."""
+    return pragmas().get('busy_timeout', 0) / 1000
+
+
+def retry_on_busy(func=None, using=DEFAULT_DB_ALIAS):
+    """Выполняет func в транзакции и повторяет ее целиком, пока база занята.
+
+    busy_timeout не помогает, когда транзакция с устаревшим снимком
+    пытается писать: SQLite отказывает сразу, и начинать заново нужно
+    всю транзакцию. Если же отказ пришел после ожидания busy_timeout,
+    база занята надолго и повтор только задержит ответ.
+
+    Внутри внешней транзакции повтора нет: перезапустить можно только
+    ее целиком.
+    """
+    if func is None:
+        return lambda func: retry_on_busy(func, using)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if connections[using].in_atomic_block:
+            return func(*args, **kwargs)
+        attempts = getattr(settings, 'SQLITE_BUSY_ATTEMPTS', BUSY_ATTEMPTS)
+        delay = BUSY_DELAY
+        for attempt in range(1, attempts + 1):
+            started = time.monotonic()
+            try:
+                with transaction.atomic(using=using):
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                waited = time.monotonic() - started
+                if (attempt == attempts or not is_busy(error)
+                        or waited >= busy_timeout()):
+                    raise
+            time.sleep(delay * random.uniform(0.75, 1.25))
+            delay *= 2
+    return wrapper
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Обработчик connection_created: прагмы для SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas())
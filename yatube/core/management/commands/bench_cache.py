@@ -0,0 +1,46 @@
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache.sqlite import SQLiteCache
+
+OPTIONS = {'MAX_ENTRIES': 1000000}
+
+
+def throughput(operation, keys):
+    started = time.perf_counter()
+    for key in keys:
+        operation(key)
+    return len(keys) / (time.perf_counter() - started)
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость get/set SQLiteCache и LocMemCache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ops', type=int, default=20000)
+        parser.add_argument('--size', type=int, default=2048,
+                            help='Размер значения в байтах')
+
+    def handle(self, *args, **options):
+        keys = [f'bench:{i}' for i in range(options['ops'])]
+        value = 'x' * options['size']
+        with tempfile.TemporaryDirectory() as directory:
+            backends = {
+                'locmem': LocMemCache('bench', {'OPTIONS': OPTIONS}),
+                'sqlite': SQLiteCache(
+                    os.path.join(directory, 'cache.sqlite3'),
+                    {'OPTIONS': OPTIONS}),
+            }
+            self.stdout.write(f'{"backend":<8} {"set/s":>10} {"get/s":>10} '
+                              f'{"get_many/s":>12}')
+            for name, cache in backends.items():
+                sets = throughput(lambda key: cache.set(key, value), keys)
+                gets = throughput(cache.get, keys)
+                batches = [keys[i:i + 10] for i in range(0, len(keys), 10)]
+                many = throughput(cache.get_many, batches) * 10
+                self.stdout.write(
+                    f'{name:<8} {sets:>10.0f} {gets:>10.0f} {many:>12.0f}')
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.test.utils import override_settings
+
+from core.db import DEFAULT_PRAGMAS, is_busy, retry_on_busy
+
+ALIAS = 'bench'
+SCHEMA = (
+    '''CREATE TABLE post (
+        id INTEGER PRIMARY KEY,
+        text TEXT NOT NULL,
+        author_id INTEGER NOT NULL,
+        pub_date REAL NOT NULL
+    )''',
+    'CREATE INDEX post_author_date ON post (author_id, pub_date)',
+    'CREATE TABLE counter (key TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+    "INSERT INTO counter VALUES ('all', 0)",
+)
+AUTHORS = 50
+
+
+@contextmanager
+def temporary_database(alias, path):
+    """Подключает файл SQLite к django.db.connections под именем alias.
+
+    Соединения создаются самим Django, поэтому получают прагмы через
+    connection_created, как и основная база. Каждый поток открывает
+    свое соединение и должен закрыть его сам.
+    """
+    connections.databases[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+    try:
+        yield connections[alias]
+    finally:
+        connections[alias].close()
+        del connections.databases[alias]
+        if hasattr(connections._connections, alias):
+            delattr(connections._connections, alias)
+
+
+def read(number):
+    with connections[ALIAS].cursor() as cursor:
+        cursor.execute(
+            'SELECT id, text FROM post WHERE author_id = %s '
+            'ORDER BY pub_date DESC LIMIT 10', [number % AUTHORS])
+        cursor.fetchall()
+
+
+@retry_on_busy(using=ALIAS)
+def write(number):
+    # Новый пост и счетчик в одной транзакции, как при публикации.
+    with connections[ALIAS].cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO post (text, author_id, pub_date) '
+            'VALUES (%s, %s, %s)', ['x' * 200, number % AUTHORS, time.time()])
+        cursor.execute(
+            "UPDATE counter SET value = value + 1 WHERE key = 'all'")
+
+
+class Worker(threading.Thread):
+    def __init__(self, operation, deadline):
+        super().__init__()
+        self.operation = operation
+        self.deadline = deadline
+        self.done = self.busy = 0
+
+    def run(self):
+        number = 0
+        try:
+            while time.monotonic() < self.deadline:
+                number += 1
+                try:
+                    self.operation(number)
+                except OperationalError as error:
+                    if not is_busy(error):
+                        raise
+                    self.busy += 1
+                else:
+                    self.done += 1
+        finally:
+            connections[ALIAS].close()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает чтение и запись в SQLite из нескольких потоков '
+            'с прагмами core.db и без них')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--rows', type=int, default=20000,
+                            help='Постов в базе до начала замера')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"mode":<8} {"reads/s":>10} {"writes/s":>10} '
+                          f'{"busy":>6}')
+        # Без прагм у соединения остается timeout sqlite3 в 5 секунд.
+        untuned = {name: None for name in DEFAULT_PRAGMAS}
+        for mode, values in (('default', untuned), ('tuned', {})):
+            with tempfile.TemporaryDirectory() as directory, \
+                    override_settings(SQLITE_PRAGMAS=values), \
+                    temporary_database(
+                        ALIAS, os.path.join(directory, 'bench.sqlite3')):
+                self.prepare(options['rows'])
+                reads, writes, busy = self.measure(options)
+            self.stdout.write(f'{mode:<8} {reads:>10.0f} {writes:>10.0f} '
+                              f'{busy:>6}')
+
+    def prepare(self, rows):
+        connection = connections[ALIAS]
+        with connection.cursor() as cursor:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            cursor.executemany(
+                'INSERT INTO post (text, author_id, pub_date) '
+                'VALUES (%s, %s, %s)',
+                [('x' * 200, number % AUTHORS, number)
+                 for number in range(rows)])
+        connection.close()
+
+    def measure(self, options):
+        deadline = time.monotonic() + options['seconds']
+        readers = [Worker(read, deadline)
+                   for _ in range(options['readers'])]
+        writers = [Worker(write, deadline)
+                   for _ in range(options['writers'])]
+        started = time.monotonic()
+        for worker in readers + writers:
+            worker.start()
+        for worker in readers + writers:
+            worker.join()
+        elapsed = time.monotonic() - started
+        return (sum(worker.done for worker in readers) / elapsed,
+                sum(worker.done for worker in writers) / elapsed,
+                sum(worker.busy for worker in readers + writers))
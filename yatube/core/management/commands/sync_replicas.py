@@ -0,0 +1,50 @@
+import os
+import sqlite3
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+def database_path(name):
+    """Путь к файлу из NAME, в том числе вида file:...?immutable=1."""
+    if name.startswith('file:'):
+        return urlsplit(name).path
+    return name
+
+
+def copy_database(source, target):
+    """Согласованная копия через backup API, подменяющая target целиком.
+
+    Копия переводится из WAL в обычный журнал: реплика открывается
+    только на чтение и не должна зависеть от -wal файлов.
+    """
+    temporary = f'{target}.tmp'
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    primary = sqlite3.connect(source)
+    copy = sqlite3.connect(temporary)
+    try:
+        primary.backup(copy)
+        copy.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        copy.close()
+        primary.close()
+    os.replace(temporary, target)
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в файлы реплик'
+
+    def handle(self, *args, **options):
+        aliases = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not aliases:
+            raise CommandError(
+                'Реплики не настроены, см. YATUBE_DB_REPLICAS')
+        databases = settings.DATABASES
+        source = database_path(databases[DEFAULT_DB_ALIAS]['NAME'])
+        for alias in aliases:
+            target = database_path(databases[alias]['NAME'])
+            copy_database(source, target)
+            self.stdout.write(f'{alias}: {target}')
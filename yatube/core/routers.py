@@ -0,0 +1,155 @@
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'primary_until'
+DEFAULT_VIEWS = ('posts:index', 'posts:group', 'posts:profile',
+                 'posts:post_detail', 'posts:follow_index')
+# auth читается с основной базы: по пользователю из реплики сессия
+# со свежим паролем или новый пользователь выглядели бы разлогиненными.
+DEFAULT_APPS = ('posts',)
+# Таблица, в которую пишет запрос: INSERT [OR IGNORE] INTO, UPDATE,
+# DELETE FROM.
+WRITE_SQL = re.compile(
+    r'\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|REPLACE\s+INTO|UPDATE|'
+    r'DELETE\s+FROM)\s+["`]?(\w+)', re.IGNORECASE)
+
+# Состояние текущего запроса: можно ли читать с реплик и была ли запись.
+_replica_reads = ContextVar('replica_reads', default=False)
+_writes = ContextVar('writes', default=None)
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def track_writes(using=DEFAULT_DB_ALIAS):
+    """Запоминает таблицы, в которые код внутри блока действительно
+    записал: db_for_write вызывается и для чтения внутри get_or_create,
+    поэтому смотрим на сами запросы."""
+    writes = []
+    token = _writes.set(writes)
+    try:
+        with connections[using].execute_wrapper(_record_write):
+            yield writes
+    finally:
+        _writes.reset(token)
+
+
+@contextmanager
+def untracked_writes():
+    """Записи внутри блока не закрепляют клиента за основной базой."""
+    token = _writes.set(None)
+    try:
+        yield
+    finally:
+        _writes.reset(token)
+
+
+def _record_write(execute, sql, params, many, context):
+    result = execute(sql, params, many, context)
+    writes = _writes.get()
+    match = writes is not None and WRITE_SQL.match(sql)
+    if match and match.group(1) in replicated_tables():
+        writes.append(match.group(1))
+    return result
+
+
+def is_replicated(model):
+    return model._meta.app_label in getattr(settings, 'REPLICA_APPS',
+                                            DEFAULT_APPS)
+
+
+def replicated_tables():
+    return {model._meta.db_table
+            for model in apps.get_models(include_auto_created=True)
+            if is_replicated(model)}
+
+
+class ReplicaRouter:
+    """Чтение лент с реплик, запись и все остальное — в default.
+
+    Реплики включает ReplicaMiddleware только для представлений из
+    REPLICA_VIEWS; пользователи, сессии и прочие служебные таблицы
+    читаются с основной базы всегда.
+    """
+
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if aliases and _replica_reads.get() and is_replicated(model):
+            return random.choice(aliases)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в default.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплики получают схему вместе с копией основной базы.
+        return db not in replicas()
+
+
+class ReplicaMiddleware:
+    """Выбирает базу для чтения и закрепляет писавших за основной.
+
+    После запроса, который что-то записал, клиент получает cookie на
+    REPLICA_STICKY_SECONDS секунд; пока она действует, его запросы
+    читают с основной базы и видят свои изменения, даже если реплика
+    отстает.
+
+    Страницы для кэша анонимов строятся по основной базе: версии
+    пространств имен уже сброшены записью, и отставшая реплика
+    сохранилась бы в кэше под новыми версиями.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with replica_reads(False), track_writes() as writes:
+            response = self.get_response(request)
+        if writes and replicas():
+            window = sticky_seconds()
+            response.set_cookie(STICKY_COOKIE, int(time.time() + window),
+                                max_age=window, httponly=True,
+                                samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        if (replicas() and request.method in ('GET', 'HEAD')
+                and match is not None
+                and match.view_name in getattr(settings, 'REPLICA_VIEWS',
+                                               DEFAULT_VIEWS)
+                and not getattr(request, 'page_cacheable', False)
+                and not self.is_sticky(request)):
+            # Сбросится при выходе из replica_reads(False) в __call__.
+            _replica_reads.set(True)
+            request.replica_reads = True
+
+    def is_sticky(self, request):
+        until = request.COOKIES.get(STICKY_COOKIE, '')
+        return until.isdigit() and int(until) > time.time()
@@ -0,0 +1,48 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from ..cache.stampede import get_or_refresh
+
+register = template.Library()
+
+
+class SWRCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        try:
+            timeout = int(timeout)
+        except (ValueError, TypeError):
+            raise template.TemplateSyntaxError(
+                f'"swr_cache" tag got a non-integer timeout value: '
+                f'{timeout!r}')
+        key = make_template_fragment_key(
+            self.fragment_name,
+            [var.resolve(context) for var in self.vary_on])
+        return get_or_refresh(key, lambda: self.nodelist.render(context),
+                              timeout)
+
+
+@register.tag('swr_cache')
+def do_swr_cache(parser, token):
+    """Как {% cache %}, но истекший фрагмент пересчитывает один процесс.
+
+    {% swr_cache 60 feed page_obj.number %} ... {% endswr_cache %}
+    """
+    nodelist = parser.parse(('endswr_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{tokens[0]}' tag requires at least 2 arguments.")
+    return SWRCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+    )
@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from ..cache.sqlite import SQLiteCache
+
+
+def make_cache(path, **options):
+    return SQLiteCache(path, {'OPTIONS': options})
+
+
+def increment(path, times):
+    cache = make_cache(path)
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'cache.sqlite3')
+        self.cache = make_cache(self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_set_delete(self):
+        """Базовые операции кэша"""
+        self.cache.set('key', {'a': 1})
+        self.assertEqual(self.cache.get('key'), {'a': 1})
+        self.cache.set_many({'one': 1, 'two': 2})
+        self.assertEqual(self.cache.get_many(['one', 'two', 'three']),
+                         {'one': 1, 'two': 2})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_expiry_and_add(self):
+        """add не перезаписывает живой ключ, но занимает истекший"""
+        self.assertTrue(self.cache.add('key', 1, 0.1))
+        self.assertFalse(self.cache.add('key', 2))
+        time.sleep(0.2)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 3))
+        self.assertEqual(self.cache.get('key'), 3)
+
+    def test_shared_between_processes(self):
+        """incr атомарен и виден из других процессов"""
+        self.cache.set('counter', 0)
+        workers = [multiprocessing.Process(target=increment,
+                                           args=(self.path, 50))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читанные ключи"""
+        cache = make_cache(self.path, MAX_ENTRIES=3, CULL_FREQUENCY=3)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        cache._connection().execute(
+            "UPDATE cache SET accessed = accessed - 10 WHERE key != 'a'")
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertEqual(cache.get('a'), 'a')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('d'), 'd')
+
+    def test_size_bound(self):
+        """Суммарный размер значений не превышает MAX_SIZE"""
+        cache = make_cache(self.path, MAX_SIZE=10000)
+        for i in range(20):
+            cache.set(f'key{i}', 'x' * 1000)
+        entries, size = cache._connection().execute(
+            'SELECT entries, size FROM stats').fetchone()
+        self.assertLessEqual(size, 10000)
+        self.assertEqual(cache.get('key19'), 'x' * 1000)
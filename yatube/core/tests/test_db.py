@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.db import OperationalError, connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from ..db import retry_on_busy
+from ..management.commands.bench_db import temporary_database
+
+
+class PragmaTests(TestCase):
+    def test_pragmas_applied(self):
+        """Новое соединение получает прагмы"""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -64000)
+
+
+@mock.patch('core.db.time.sleep')
+class RetryOnBusyTests(TransactionTestCase):
+    def run_view(self, errors):
+        calls = []
+
+        @retry_on_busy
+        def view():
+            calls.append(connection.in_atomic_block)
+            if len(calls) <= len(errors):
+                raise errors[len(calls) - 1]
+            return 'ok'
+
+        return view(), calls
+
+    def test_retries_transaction(self, sleep):
+        """Занятая база — транзакция повторяется с растущей паузой"""
+        busy = OperationalError('database is locked')
+        self.assertEqual(self.run_view([busy, busy]),
+                         ('ok', [True, True, True]))
+        first, second = (call.args[0] for call in sleep.call_args_list)
+        self.assertGreater(second, first)
+
+    def test_gives_up(self, sleep):
+        """После последней попытки ошибка пробрасывается"""
+        busy = OperationalError('database is locked')
+        with self.assertRaises(OperationalError):
+            self.run_view([busy] * 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_no_retry_after_timeout_or_other_errors(self, sleep):
+        """Отказ после busy_timeout и прочие ошибки не повторяются"""
+        with mock.patch('core.db.busy_timeout', return_value=0):
+            with self.assertRaises(OperationalError):
+                self.run_view([OperationalError('database is locked')])
+        with self.assertRaises(OperationalError):
+            self.run_view([OperationalError('no such table: x')])
+        sleep.assert_not_called()
+
+    def test_no_retry_in_transaction(self, sleep):
+        """Во внешней транзакции повтора нет"""
+        with transaction.atomic():
+            with self.assertRaises(OperationalError):
+                self.run_view([OperationalError('database is locked')])
+        sleep.assert_not_called()
+
+
+class StaleSnapshotTests(SimpleTestCase):
+    def test_transaction_restarted(self):
+        """Транзакция с устаревшим снимком перезапускается целиком"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stale.sqlite3')
+            other = sqlite3.connect(path, isolation_level=None)
+            other.execute('PRAGMA journal_mode = WAL')
+            other.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+            calls = []
+
+            @retry_on_busy(using='stale')
+            def add():
+                calls.append(1)
+                with connections['stale'].cursor() as cursor:
+                    cursor.execute('SELECT COUNT(*) FROM item')
+                    if len(calls) == 1:
+                        # Чужая запись после чтения: снимок устарел,
+                        # и SQLite откажет сразу, не ожидая busy_timeout.
+                        other.execute('INSERT INTO item DEFAULT VALUES')
+                    cursor.execute('INSERT INTO item DEFAULT VALUES')
+
+            try:
+                with temporary_database('stale', path), \
+                        mock.patch('core.db.time.sleep'):
+                    add()
+                self.assertEqual(len(calls), 2)
+                self.assertEqual(
+                    other.execute('SELECT COUNT(*) FROM item').fetchone(),
+                    (2,))
+            finally:
+                other.close()
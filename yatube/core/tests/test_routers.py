@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts import counters
+from posts.models import Post, PostCounter
+
+from .. import routers
+from ..management.commands.sync_replicas import copy_database, database_path
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+
+    def test_reads(self):
+        """С реплик читаются только разрешенные приложения"""
+        self.assertIsNone(self.router.db_for_read(Post))
+        with routers.replica_reads():
+            self.assertIn(self.router.db_for_read(Post),
+                          ['replica1', 'replica2'])
+            self.assertIsNone(self.router.db_for_read(User))
+            self.assertIsNone(self.router.db_for_read(Session))
+
+    def test_writes_and_migrations(self):
+        """Запись идет в default, миграции — не на реплики"""
+        self.assertEqual(self.router.db_for_write(Session), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+
+class TrackWritesTests(TestCase):
+    def test_only_statements_that_write(self):
+        """Запоминаются только запросы, которые пишут в реплицируемые
+        таблицы"""
+        user = User.objects.create_user(username='author')
+        PostCounter.objects.create(key='all', value=0)
+        with routers.track_writes() as writes:
+            PostCounter.objects.get_or_create(key='all')
+            counters.get_count('author:1', Post.objects.all())
+            user.save()
+            self.assertEqual(writes, [])
+            Post.objects.create(author=user, text='Пост')
+        self.assertIn(Post._meta.db_table, writes)
+        self.assertEqual(routers.WRITE_SQL.match(
+            'INSERT OR IGNORE INTO "posts_timelineentry" (x) SELECT 1'
+        ).group(1), 'posts_timelineentry')
+
+
+# Локально реплика — тот же default: проверяется выбор, а не данные.
+@override_settings(DATABASE_REPLICAS=['default'])
+@mock.patch('core.routers.random.choice', side_effect=lambda aliases:
+            aliases[0])
+class ReplicaMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_feeds_read_from_replica(self, choice):
+        """Ленты читают с реплики, формы — с основной базы"""
+        self.client.get(reverse('posts:index'))
+        self.assertTrue(choice.called)
+        choice.reset_mock()
+        self.client.get(reverse('posts:post_create'))
+        self.assertFalse(choice.called)
+
+    def test_replica_pages_not_validated(self, choice):
+        """Страница с реплики не получает ETag, а с основной базы — да"""
+        url = reverse('posts:profile', args=[self.user.username])
+        response = self.client.get(url)
+        self.assertTrue(choice.called)
+        self.assertFalse(response.has_header('ETag'))
+        with override_settings(DATABASE_REPLICAS=[]):
+            response = self.client.get(url)
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_sticky_after_write(self, choice):
+        """После записи пользователь читает с основной базы"""
+        response = self.client.post(reverse('posts:post_create'),
+                                    {'text': 'Новый пост'})
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+        choice.reset_mock()
+        self.client.get(reverse('posts:index'))
+        self.assertFalse(choice.called)
+        self.client.cookies.pop(routers.STICKY_COOKIE)
+        self.client.get(reverse('posts:index'))
+        self.assertTrue(choice.called)
+
+    def test_reads_do_not_stick(self, choice):
+        """Простое чтение не закрепляет за основной базой, даже если
+        завело счетчик постов"""
+        for _ in range(2):
+            response = self.client.get(reverse('posts:index'))
+            self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+        self.assertTrue(PostCounter.objects.filter(key='all').exists())
+
+
+class SyncReplicasTests(SimpleTestCase):
+    def test_copy(self):
+        """Копия содержит данные и не зависит от WAL основной базы"""
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'db.sqlite3')
+            target = os.path.join(directory, 'db.replica1.sqlite3')
+            primary = sqlite3.connect(source, isolation_level=None)
+            primary.execute('PRAGMA journal_mode = WAL')
+            primary.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+            primary.execute('INSERT INTO item DEFAULT VALUES')
+            copy_database(source, target)
+            primary.close()
+            replica = sqlite3.connect(
+                f'file:{target}?immutable=1', uri=True)
+            self.assertEqual(
+                replica.execute('SELECT COUNT(*) FROM item').fetchone(),
+                (1,))
+            self.assertEqual(
+                replica.execute('PRAGMA journal_mode').fetchone(),
+                ('delete',))
+            replica.close()
+        self.assertEqual(database_path('file:/srv/db.sqlite3?immutable=1'),
+                         '/srv/db.sqlite3')
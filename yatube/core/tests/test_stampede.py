@@ -0,0 +1,78 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import SimpleTestCase
+
+from ..cache.stampede import LOCK_KEY, get_or_refresh
+
+
+class StampedeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_single_recompute_under_load(self):
+        """Истекшее значение пересчитывает один поток, остальные
+        получают старое без ожидания.
+        """
+        get_or_refresh('feed', lambda: 'old', 0.05, stale_timeout=10)
+        time.sleep(0.1)
+        calls = []
+        results = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'new'
+
+        threads = [threading.Thread(
+            target=lambda: results.append(
+                get_or_refresh('feed', slow, 60, beta=0)))
+            for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertIn('new', results)
+        self.assertEqual(results.count('old'), 7)
+        self.assertEqual(get_or_refresh('feed', slow, 60, beta=0), 'new')
+
+    def test_cold_miss_waits_for_owner(self):
+        """Без старого значения ждем, пока владелец блокировки посчитает"""
+        cache.add(LOCK_KEY.format('cold'), True, 5)
+
+        def finish():
+            time.sleep(0.1)
+            cache.set('cold', ('ready', time.time() + 60, 0.1), 120)
+            cache.delete(LOCK_KEY.format('cold'))
+
+        threading.Thread(target=finish).start()
+        value = get_or_refresh('cold', lambda: 'computed', 60)
+        self.assertEqual(value, 'ready')
+
+    def test_waiter_keeps_foreign_lock(self):
+        """Не дождавшийся пересчета не снимает чужую блокировку"""
+        cache.add(LOCK_KEY.format('slow'), 'owner', 5)
+        value = get_or_refresh('slow', lambda: 'computed', 60,
+                               lock_timeout=0.1)
+        self.assertEqual(value, 'computed')
+        self.assertEqual(cache.get(LOCK_KEY.format('slow')), 'owner')
+
+    def test_validate_marks_value_stale(self):
+        """validate досрочно объявляет значение устаревшим"""
+        get_or_refresh('key', lambda: 1, 60)
+        value = get_or_refresh('key', lambda: 2, 60,
+                               validate=lambda value: value == 2)
+        self.assertEqual(value, 2)
+
+    def test_template_tag(self):
+        """{% swr_cache %} кэширует фрагмент по имени и аргументам"""
+        template = Template(
+            '{% load swr_cache %}'
+            '{% swr_cache 60 fragment number %}{{ value }}{% endswr_cache %}')
+        first = template.render(Context({'number': 1, 'value': 'a'}))
+        cached = template.render(Context({'number': 1, 'value': 'b'}))
+        other = template.render(Context({'number': 2, 'value': 'c'}))
+        self.assertEqual((first, cached, other), ('a', 'a', 'c'))
@@ -5,6 +5,10 @@ def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
 
 
+def permission_denied(request, exception):
+    return render(request, 'core/403permission.html', status=403)
+
+
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html', status=403)
 
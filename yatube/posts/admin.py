@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.db.models.expressions import RawSQL
 from .models import Post
 from .models import Group
+from .search import match_expression, matching_ids_sql
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,6 +12,14 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по полнотекстовому индексу, а не LIKE по всей таблице.
+        match = match_expression(search_term)
+        if match is None:
+            return queryset, False
+        return queryset.filter(
+            pk__in=RawSQL(matching_ids_sql(), [match])), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'description', 'slug')
@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+
+from . import pagecache, timeline
+from .models import Follow, Group, Post
+from .paginators import POSTS_PER_PAGE, CursorPaginator
+
+User = get_user_model()
+
+MAX_LIMIT = 50
+JSON_PARAMS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def serialize_post(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'modified': post.modified,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created,
+    }
+
+
+def limit(request):
+    value = request.GET.get('limit', '')
+    if not value.isdigit() or not int(value):
+        return POSTS_PER_PAGE
+    return min(int(value), MAX_LIMIT)
+
+
+def page_data(request, posts):
+    """Страница ленты по ?cursor= и ссылки на соседние страницы."""
+    page = CursorPaginator(posts, limit(request)).get_page(
+        request.GET.get('cursor'))
+    links = {}
+    for name, has_page, token in (
+            ('next', page.has_next, page.next_page_number),
+            ('previous', page.has_previous, page.previous_page_number)):
+        links[name] = None
+        if has_page():
+            query = request.GET.copy()
+            query['cursor'] = token()
+            links[name] = f'{request.path}?{query.urlencode()}'
+    data = {'results': [serialize_post(post) for post in page]}
+    data.update(links)
+    return data, [post.modified for post in page]
+
+
+def conditional(request, namespaces, build, *extra):
+    """304 по версиям pagecache, иначе JSON из build().
+
+    build возвращает данные и даты изменения вошедших в ответ записей.
+    """
+    response = pagecache.not_modified(request, *namespaces, extra=extra)
+    if response is not None:
+        return response
+    data, dates = build()
+    return pagecache.validated(
+        request, JsonResponse(data, json_dumps_params=JSON_PARAMS), dates)
+
+
+def index(request):
+    return conditional(
+        request, [pagecache.GLOBAL],
+        lambda: page_data(request, Post.objects.for_feed()))
+
+
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return conditional(
+        request, [pagecache.group_ns(group.pk)],
+        lambda: page_data(request, group.posts.for_feed()))
+
+
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return conditional(
+        request, [pagecache.author_ns(author.pk)],
+        lambda: page_data(request, author.posts.for_feed()))
+
+
+def follow(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужно войти'}, status=401)
+    author_ids = sorted(Follow.objects.filter(
+        user=request.user).values_list('author_id', flat=True))
+    response = conditional(
+        request, [pagecache.author_ns(pk) for pk in author_ids],
+        lambda: page_data(request, timeline.feed(request.user).for_feed()),
+        author_ids)
+    response['Cache-Control'] = 'private'
+    return response
+
+
+def post_detail(request, post_id):
+    author_id = get_object_or_404(
+        Post.objects.values_list('author_id', flat=True), pk=post_id)
+
+    def build():
+        post = Post.objects.for_detail().get(pk=post_id)
+        data = serialize_post(post)
+        data['author_posts_count'] = post.author_posts_count
+        comments = post.comments.all()
+        data['comments'] = [serialize_comment(comment)
+                            for comment in comments]
+        return data, [post.modified] + [comment.created
+                                        for comment in comments]
+
+    return conditional(
+        request, [pagecache.post_ns(post_id), pagecache.author_ns(author_id)],
+        build)
@@ -0,0 +1,312 @@
+import bisect
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.urls import reverse
+
+VERSION_KEY = 'posts:autocomplete:version'
+CHANGE_KEY = 'posts:autocomplete:change:{}'
+CHANGE_TIMEOUT = 60 * 60
+MAX_REPLAY = 1000
+MIN_SIMILARITY = 0.3
+# У записи до двух слов (название и slug), поэтому узлу нужно вдвое
+# больше лучших слов, чем подсказок в ответе.
+TOP_SIZE = 20
+GROUP = 'group'
+USER = 'user'
+ROUTES = {GROUP: 'posts:group', USER: 'posts:profile'}
+
+
+def normalize(term):
+    return term.casefold().replace('ё', 'е').strip()
+
+
+def trigrams(term):
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrieNode:
+    __slots__ = ('children', 'keys', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.keys = set()
+        # Самые короткие слова поддерева: (длина, слово, ключ).
+        self.top = []
+
+
+class PrefixTrie:
+    """Префиксное дерево, где каждый узел помнит TOP_SIZE самых коротких
+    слов своего поддерева: поиск не обходит поддерево."""
+
+    def __init__(self):
+        self.root = TrieNode()
+
+    def insert(self, term, key):
+        entry = (len(term), term, key)
+        node = self.root
+        self._add_top(node, entry)
+        for char in term:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = TrieNode()
+            node = child
+            self._add_top(node, entry)
+        node.keys.add(key)
+
+    @staticmethod
+    def _add_top(node, entry):
+        top = node.top
+        if len(top) == TOP_SIZE and entry >= top[-1] or entry in top:
+            return
+        bisect.insort(top, entry)
+        del top[TOP_SIZE:]
+
+    def remove(self, term, key):
+        path = [(None, self.root)]
+        node = self.root
+        for char in term:
+            node = node.children.get(char)
+            if node is None:
+                return
+            path.append((char, node))
+        node.keys.discard(key)
+        # Пустые ветки удаляем, чтобы поиск не заходил в тупики.
+        for depth in range(len(path) - 1, 0, -1):
+            char, node = path[depth]
+            if node.keys or node.children:
+                break
+            del path[depth - 1][1].children[char]
+            path.pop()
+        # Освободившиеся места занимают слова из лучших у детей.
+        entry = (len(term), term, key)
+        for depth in range(len(path) - 1, -1, -1):
+            node = path[depth][1]
+            if entry not in node.top:
+                break
+            word = term[:depth]
+            top = [(depth, word, own) for own in node.keys]
+            for child in node.children.values():
+                top.extend(child.top)
+            node.top = sorted(top)[:TOP_SIZE]
+
+    def search(self, prefix, limit):
+        """Ключи слов с префиксом, короткие слова первыми."""
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        found = []
+        for _, _, key in node.top:
+            if key not in found:
+                found.append(key)
+        return found[:limit]
+
+
+class TrigramIndex:
+    def __init__(self):
+        self.postings = {}
+        self.grams = {}
+
+    def add(self, term, key):
+        grams = trigrams(term)
+        self.grams[(term, key)] = grams
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add((term, key))
+
+    def remove(self, term, key):
+        for gram in self.grams.pop((term, key), ()):
+            entries = self.postings[gram]
+            entries.discard((term, key))
+            if not entries:
+                del self.postings[gram]
+
+    def search(self, query, limit):
+        """Ключи, похожие на запрос по доле общих триграмм.
+
+        Похожему слову нужно хотя бы needed общих триграмм, поэтому
+        кандидатов достаточно взять из самых коротких списков, пропустив
+        needed - 1 самых длинных (вроде ' ab' в начале слова).
+        """
+        grams = trigrams(query)
+        needed = max(1, math.ceil(MIN_SIMILARITY * len(grams)))
+        lists = sorted((self.postings.get(gram, ()) for gram in grams),
+                       key=len)
+        candidates = set()
+        for entries in lists[:len(lists) - needed + 1]:
+            candidates.update(entries)
+        scores = {}
+        for entry in candidates:
+            other = self.grams[entry]
+            common = len(grams & other)
+            similarity = common / (len(grams) + len(other) - common)
+            key = entry[1]
+            if similarity >= MIN_SIMILARITY:
+                scores[key] = max(scores.get(key, 0), similarity)
+        return sorted(scores, key=lambda key: (-scores[key], key))[:limit]
+
+
+class Autocomplete:
+    """Группы и пользователи по началу названия или с опечатками."""
+
+    def __init__(self):
+        self.trie = PrefixTrie()
+        self.trigrams = TrigramIndex()
+        self.entries = {}
+
+    def add(self, key, label, url_arg, terms):
+        self.remove(key)
+        terms = {normalize(term) for term in terms if term}
+        self.entries[key] = (label, url_arg, terms)
+        for term in terms:
+            self.trie.insert(term, key)
+            self.trigrams.add(term, key)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for term in entry[2]:
+            self.trie.remove(term, key)
+            self.trigrams.remove(term, key)
+
+    def suggest(self, query, limit=10):
+        query = normalize(query)
+        if not query:
+            return []
+        keys = self.trie.search(query, limit)
+        if len(keys) < limit and len(query) >= 3:
+            for key in self.trigrams.search(query, limit):
+                if key not in keys and len(keys) < limit:
+                    keys.append(key)
+        results = []
+        for key in keys:
+            label, url_arg, _ = self.entries[key]
+            results.append({'type': key[0], 'label': label,
+                            'url': reverse(ROUTES[key[0]], args=[url_arg])})
+        return results
+
+
+def load(index, kind, pks=None):
+    """Заносит в индекс строки из БД; pks, которых нет, удаляются."""
+    from .models import Group
+    if kind == GROUP:
+        rows = Group.objects.values_list('pk', 'title', 'slug')
+    else:
+        rows = get_user_model().objects.values_list('pk', 'username',
+                                                    'username')
+    if pks is not None:
+        rows = rows.filter(pk__in=pks)
+    found = set()
+    for pk, label, slug in rows.iterator():
+        index.add((kind, pk), label, slug, [label, slug])
+        found.add(pk)
+    for pk in set(pks or ()) - found:
+        index.remove((kind, pk))
+
+
+def build():
+    index = Autocomplete()
+    load(index, GROUP)
+    load(index, USER)
+    return index
+
+
+_lock = threading.RLock()
+_index = None
+_version = None
+_checked = 0
+
+
+def _shared_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 0, None)
+        version = cache.get(VERSION_KEY, 0)
+    return version
+
+
+def _catch_up(version):
+    """Догоняет чужие изменения по журналу в кэше; False — не вышло."""
+    if _version is None or not 0 < version - _version <= MAX_REPLAY:
+        return False
+    keys = [CHANGE_KEY.format(number)
+            for number in range(_version + 1, version + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return False
+    pks = {}
+    for kind, pk in changes.values():
+        pks.setdefault(kind, set()).add(pk)
+    for kind, kind_pks in pks.items():
+        load(_index, kind, kind_pks)
+    return True
+
+
+def get_index():
+    """Индекс процесса, синхронизированный с изменениями других.
+
+    Общая версия из кэша проверяется не чаще раза в
+    AUTOCOMPLETE_CHECK_INTERVAL секунд; пропущенные изменения
+    перечитываются из БД точечно, а если журнал уже вытеснен,
+    индекс строится заново.
+    """
+    global _index, _version, _checked
+    interval = getattr(settings, 'AUTOCOMPLETE_CHECK_INTERVAL', 5)
+    now = time.monotonic()
+    if _index is not None and now - _checked < interval:
+        return _index
+    with _lock:
+        version = _shared_version()
+        _checked = now
+        if _index is None or (version != _version
+                              and not _catch_up(version)):
+            _index = build()
+        _version = version
+        return _index
+
+
+def warm_up():
+    """Строит индекс в фоновом потоке, чтобы его не ждал первый запрос."""
+    def run():
+        try:
+            get_index()
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run, name='autocomplete-warm-up',
+                              daemon=True)
+    thread.start()
+    return thread
+
+
+def changed(kind, pk):
+    """Записывает изменение в журнал после коммита: раньше другие
+    процессы перечитали бы из БД еще не сохраненную строку."""
+    transaction.on_commit(lambda: _publish(kind, pk))
+
+
+def _publish(kind, pk):
+    global _version, _checked
+    with _lock:
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, 1, None)
+            version = 1
+        cache.set(CHANGE_KEY.format(version), (kind, pk), CHANGE_TIMEOUT)
+        if _index is None:
+            return
+        if _version is not None and version == _version + 1:
+            load(_index, kind, [pk])
+            _version = version
+        else:
+            # Есть чужие изменения — догоним при следующем запросе.
+            _checked = 0
@@ -0,0 +1,43 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .paginators import EPOCH, MICROSECOND
+from .thumbnails import prefetch_thumbnails
+from .variants import prefetch_variants
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_key(post):
+    stamp = (post.modified - EPOCH) // MICROSECOND
+    # Автор и группа видны в карточке, но их правка не меняет modified.
+    shown = (post.author.username, post.group.slug if post.group_id else '')
+    digest = hashlib.md5(repr(shown).encode()).hexdigest()[:8]
+    return f'post_card:{post.pk}:{stamp}:{digest}'
+
+
+def attach_cards(posts):
+    """Кладет в post.card HTML карточки; готовые берутся одним get_many.
+
+    Ключ включает время изменения поста, поэтому правка сразу дает
+    новую карточку, а старая просто вытесняется.
+    """
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    stale = [post for key, post in zip(keys, posts) if key not in cards]
+    prefetch_thumbnails(stale, 'card')
+    prefetch_variants(stale)
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            cards[key] = missing[key] = render_to_string(
+                CARD_TEMPLATE, {'post': post})
+    if missing:
+        cache.set_many(missing, getattr(settings, 'POST_CARD_TIMEOUT', None))
+    for key, post in zip(keys, posts):
+        post.card = mark_safe(cards[key])
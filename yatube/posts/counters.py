@@ -0,0 +1,68 @@
+from django.db.models import F
+
+from core.routers import untracked_writes
+
+from .models import Follow, PostCounter
+
+GLOBAL = 'all'
+BATCH_SIZE = 500
+
+
+def group_key(group_id):
+    return f'group:{group_id}'
+
+
+def author_key(author_id):
+    return f'author:{author_id}'
+
+
+def follower_key(user_id):
+    return f'follower:{user_id}'
+
+
+def post_keys(post, group_id=None):
+    """Счетчики, в которые входит пост (кроме лент подписчиков)."""
+    group_id = post.group_id if group_id is None else group_id
+    keys = [GLOBAL, author_key(post.author_id)]
+    if group_id is not None:
+        keys.append(group_key(group_id))
+    return keys
+
+
+def follower_keys(author_id):
+    """Счетчики лент подписчиков; посты тяжелых авторов в них не входят,
+    см. timeline.Feed.count."""
+    user_ids = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    return [follower_key(user_id) for user_id in user_ids.iterator()]
+
+
+def get_count(key, queryset):
+    """Значение счетчика; отсутствующий счетчик заводится по COUNT(*)."""
+    value = PostCounter.objects.filter(key=key).values_list(
+        'value', flat=True).first()
+    if value is None:
+        # Заведенный счетчик — производные данные: из-за него читатель
+        # ленты не должен закрепляться за основной базой.
+        with untracked_writes():
+            counter, _ = PostCounter.objects.get_or_create(
+                key=key, defaults={'value': queryset.count()})
+        value = counter.value
+    return value
+
+
+def change(keys, delta):
+    """Сдвигает существующие счетчики; незаведенные посчитаются при чтении."""
+    keys = list(keys)
+    for start in range(0, len(keys), BATCH_SIZE):
+        PostCounter.objects.filter(
+            key__in=keys[start:start + BATCH_SIZE]
+        ).update(value=F('value') + delta)
+
+
+def forget(keys):
+    """Удаляет счетчики; они посчитаются заново при чтении."""
+    keys = list(keys)
+    for start in range(0, len(keys), BATCH_SIZE):
+        PostCounter.objects.filter(
+            key__in=keys[start:start + BATCH_SIZE]).delete()
@@ -0,0 +1,128 @@
+import csv
+import json
+import posixpath
+import time
+import zipfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .thumbnails import image_storage
+
+CHUNK_SIZE = 2000
+FILE_CHUNK_SIZE = 64 * 1024
+FIELDS = ('id', 'text', 'pub_date', 'author__username', 'group__slug',
+          'image')
+HEADER = ('id', 'text', 'pub_date', 'author', 'group', 'image')
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+    'zip': ('application/zip', 'zip'),
+}
+IMAGES_DIR = 'images'
+
+
+def rows(queryset, chunk_size=CHUNK_SIZE):
+    """Посты кортежами по HEADER, без создания моделей.
+
+    Строки читаются из курсора пачками по chunk_size, поэтому память
+    не зависит от числа постов.
+    """
+    return queryset.order_by('pk').values_list(*FIELDS).iterator(
+        chunk_size=chunk_size)
+
+
+def archive_name(name):
+    return posixpath.join(IMAGES_DIR, name) if name else ''
+
+
+class Echo:
+    """Файл, который отдает записанное вместо хранения."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class _TextEcho:
+    """Текстовая обертка для csv.writer."""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def write(self, text):
+        return self.buffer.write(text.encode())
+
+
+def csv_chunks(queryset, chunk_size=CHUNK_SIZE):
+    buffer = Echo()
+    writer = csv.writer(_TextEcho(buffer))
+    writer.writerow(HEADER)
+    yield buffer.pop()
+    for row in rows(queryset, chunk_size):
+        row = list(row)
+        row[2] = row[2].isoformat()
+        writer.writerow(row)
+        yield buffer.pop()
+
+
+def jsonl_line(row, image_name=None):
+    record = dict(zip(HEADER, row))
+    if image_name is not None:
+        record['image'] = image_name(record['image'])
+    return (json.dumps(record, ensure_ascii=False, cls=DjangoJSONEncoder)
+            + '\n').encode()
+
+
+def jsonl_chunks(queryset, chunk_size=CHUNK_SIZE):
+    for row in rows(queryset, chunk_size):
+        yield jsonl_line(row)
+
+
+def zip_chunks(queryset, chunk_size=CHUNK_SIZE):
+    """Архив с posts.jsonl и картинками, собираемый на лету.
+
+    Zipfile пишет в поток без seek, сохраняя размеры после данных.
+    Картинки идут вторым проходом по distinct-именам из БД, так что
+    одинаковые файлы попадают в архив один раз.
+    """
+    buffer = Echo()
+    storage = image_storage()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        info = zipfile.ZipInfo('posts.jsonl')
+        info.date_time = time.localtime()[:6]
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with archive.open(info, 'w', force_zip64=True) as entry:
+            for row in rows(queryset, chunk_size):
+                entry.write(jsonl_line(row, archive_name))
+                yield buffer.pop()
+        names = queryset.exclude(image='').order_by('image').values_list(
+            'image', flat=True).distinct()
+        for name in names.iterator(chunk_size=chunk_size):
+            try:
+                source = storage.open(name)
+            except OSError:
+                continue
+            with source, archive.open(archive_name(name), 'w',
+                                      force_zip64=True) as entry:
+                for data in source.chunks(FILE_CHUNK_SIZE):
+                    entry.write(data)
+                    yield buffer.pop()
+    yield buffer.pop()
+
+
+GENERATORS = {'csv': csv_chunks, 'jsonl': jsonl_chunks, 'zip': zip_chunks}
+
+
+def chunks(queryset, export_format, chunk_size=CHUNK_SIZE):
+    return GENERATORS[export_format](queryset, chunk_size)
@@ -0,0 +1,137 @@
+from django.contrib.auth import get_user_model
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from . import pagecache
+from .models import Group, Post
+
+User = get_user_model()
+
+FEED_SIZE = 20
+FEED_KEY = 'posts:feed:{}'
+FEED_TIMEOUT = 24 * 60 * 60
+
+
+class CachedFeed(Feed):
+    """Лента, которая строится один раз на версию данных.
+
+    Готовый XML лежит в кэше под ETag, а ETag — от версий пространств
+    имен pagecache, которые сбрасываются при сохранении поста. Поэтому
+    опрос без изменений стоит одного-двух обращений к кэшу.
+    """
+
+    def namespaces(self, obj):
+        return [pagecache.GLOBAL]
+
+    def __call__(self, request, *args, **kwargs):
+        obj = self.get_object(request, *args, **kwargs)
+        response = pagecache.not_modified(request, *self.namespaces(obj),
+                                          personal=False)
+        if response is not None:
+            return response
+        key = FEED_KEY.format(request.page_etag)
+        entry = cache.get(key)
+        if entry is None:
+            feed = self.get_feed(obj, request)
+            entry = (feed.writeString('utf-8'), feed.content_type,
+                     feed.latest_post_date())
+            cache.set(key, entry, FEED_TIMEOUT)
+        content, content_type, latest = entry
+        response = HttpResponse(content, content_type=content_type)
+        return pagecache.validated(request, response, [latest])
+
+    def item_title(self, post):
+        return Truncator(post.text).words(8)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=[post.pk])
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_updateddate(self, post):
+        return post.modified
+
+    def item_categories(self, post):
+        return [post.group.title] if post.group_id else []
+
+
+class LatestPostsFeed(CachedFeed):
+    title = 'Yatube: последние посты'
+    description = 'Новые посты всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return Post.objects.for_feed()[:FEED_SIZE]
+
+
+class GroupPostsFeed(CachedFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def namespaces(self, group):
+        return [pagecache.group_ns(group.pk)]
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group', args=[group.slug])
+
+    def items(self, group):
+        return group.posts.for_feed()[:FEED_SIZE]
+
+
+class AuthorPostsFeed(CachedFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def namespaces(self, author):
+        return [pagecache.author_ns(author.pk)]
+
+    def title(self, author):
+        return f'Yatube: посты {author.username}'
+
+    def description(self, author):
+        return f'Новые посты пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+    def items(self, author):
+        return author.posts.for_feed()[:FEED_SIZE]
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class GroupPostsAtomFeed(GroupPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, group):
+        return group.description
+
+
+class AuthorPostsAtomFeed(AuthorPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, author):
+        return self.description(author)
@@ -1,12 +1,44 @@
-from .models import Post, Comment
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
+from .models import Post, Comment
+from .uploads import check_image, check_quota, probe, strip_metadata
+
 
 class PostForm(ModelForm):
     class Meta:
         model = Post
         fields = ['text', 'group', 'image']
 
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        # Отклоненный при загрузке файл дописан не до конца: его не
+        # открываем, а показываем причину отказа.
+        upload = self.files.get('image')
+        self.upload_error = getattr(upload, 'upload_error', None)
+        if self.upload_error:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        if self.upload_error:
+            raise ValidationError(self.upload_error)
+        image = self.cleaned_data['image']
+        if image is False or not image:
+            self.instance.image_size = 0
+            return image
+        if not isinstance(image, UploadedFile):
+            return image
+        image_format, size = probe(image)
+        check_image(image_format, size)
+        stripped = strip_metadata(image, image_format)
+        # В квоту идет тот же размер, что сохранится в image_size.
+        check_quota(self.user, stripped.size, exclude=self.instance.pk)
+        self.instance.image_size = stripped.size
+        return stripped
+
 
 class CommentForm(ModelForm):
     class Meta:
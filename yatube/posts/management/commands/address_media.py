@@ -0,0 +1,78 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from posts import thumbnails
+from posts.models import ImageVariant, Post
+from posts.storage import is_content_addressed, retain
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов из posts/ в хранилище по '
+            'содержимому и переписывает пути в Post.image')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько постов читать за раз',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, какие файлы будут перенесены',
+        )
+        parser.add_argument(
+            '--keep-old', action='store_true',
+            help='Не удалять файлы по старым путям',
+        )
+
+    def handle(self, *args, **options):
+        self.storage = Post._meta.get_field('image').storage
+        last_pk = 0
+        moved = failed = 0
+        while True:
+            batch = list(Post.objects.exclude(image='').filter(
+                pk__gt=last_pk).order_by('pk').values_list(
+                'pk', 'image')[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            names = {name for _, name in batch
+                     if not is_content_addressed(name)}
+            for name in sorted(names):
+                if options['dry_run']:
+                    self.stdout.write(name)
+                    continue
+                if self.move(name, options['keep_old']):
+                    moved += 1
+                else:
+                    failed += 1
+            self.stdout.write(f'Обработаны посты до id={last_pk}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено: {moved}, не найдено: {failed}'))
+
+    def move(self, name, keep_old):
+        try:
+            with self.storage.open(name) as content:
+                new_name = self.storage.save(name, content)
+        except (OSError, SuspiciousFileOperation) as error:
+            self.stderr.write(f'{name}: {error}')
+            return False
+        with transaction.atomic():
+            refs = Post.objects.filter(image=name).update(image=new_name)
+            retain(new_name, refs)
+            variants = ImageVariant.objects.filter(source=name)
+            if ImageVariant.objects.filter(source=new_name).exists():
+                # Такая же картинка уже перенесена вместе с вариантами.
+                for variant in variants:
+                    variant.file.delete(save=False)
+                variants.delete()
+            else:
+                variants.update(source=new_name)
+        if not keep_old:
+            delete(ImageFile(name, self.storage))
+        # Недостающие миниатюры и варианты; страницы с постами
+        # сбрасываются в media_ready.
+        thumbnails.generate(new_name)
+        return True
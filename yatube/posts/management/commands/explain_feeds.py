@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# unique_follow в SQLite — автоиндекс ограничения UNIQUE, его не удалить,
+# поэтому profile_follow в обоих режимах идет по нему.
+FEED_INDEXES = (
+    'post_date_idx',
+    'post_author_date_idx',
+    'post_group_date_idx',
+    'comment_post_created_idx',
+    'timeline_user_date_idx',
+)
+
+
+def first_pk(model):
+    return model.objects.values_list('pk', flat=True).first() or 1
+
+
+def view_queries():
+    """Запросы, которые выполняют представления ленты."""
+    user_id, group_id, post_id = (
+        first_pk(User), first_pk(Group), first_pk(Post))
+    return {
+        'index': Post.objects.for_feed()[:10],
+        'group_list': Post.objects.for_feed().filter(group_id=group_id)[:10],
+        'profile': Post.objects.for_feed().filter(author_id=user_id)[:10],
+        'post_detail': Comment.objects.filter(post_id=post_id),
+        'follow_index': timeline.feed(User(pk=user_id)).queries(10)[0],
+        'profile_follow': Follow.objects.filter(user_id=user_id,
+                                                author_id=user_id),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Печатает планы запросов лент с индексами и без них'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--compare', action='store_true',
+            help='Сначала показать планы без индексов (только SQLite)',
+        )
+
+    def handle(self, *args, **options):
+        if options['compare'] and connection.vendor == 'sqlite':
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    for name in FEED_INDEXES:
+                        cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+                self.print_plans('Без индексов')
+                transaction.set_rollback(True)
+        self.print_plans('С индексами')
+
+    def print_plans(self, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in view_queries().items():
+            self.stdout.write(self.style.MIGRATE_LABEL(f'  {name}'))
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f'    {line}')
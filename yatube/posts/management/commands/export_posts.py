@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты автора или группы в CSV, JSONL или ZIP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--author', help='Имя пользователя')
+        parser.add_argument('--group', help='Slug группы')
+        parser.add_argument(
+            '--format', choices=sorted(export.FORMATS), default='jsonl',
+        )
+        parser.add_argument(
+            '--output', default='-', help='Файл или - для stdout',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE,
+            help='Сколько строк читать из курсора за раз',
+        )
+
+    def handle(self, *args, **options):
+        if not options['author'] and not options['group']:
+            raise CommandError('Укажите --author или --group')
+        posts = Post.objects.all()
+        if options['author']:
+            posts = posts.filter(author__username=options['author'])
+        if options['group']:
+            posts = posts.filter(group__slug=options['group'])
+        chunks = export.chunks(posts, options['format'],
+                               options['chunk_size'])
+        if options['output'] == '-':
+            self.write(chunks, sys.stdout.buffer)
+            return
+        with open(options['output'], 'wb') as output:
+            self.write(chunks, output)
+
+    def write(self, chunks, output):
+        for chunk in chunks:
+            output.write(chunk)
+        output.flush()
@@ -0,0 +1,242 @@
+import csv
+import io
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import pagecache, thumbnails, timeline
+from posts.models import Group, Post
+from posts.storage import retain
+from posts.uploads import check_image, probe, strip_metadata
+
+User = get_user_model()
+
+
+class RowError(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Импортирует посты из JSONL или CSV с полями text, author, '
+            'group, pub_date, image')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для stdin')
+        parser.add_argument('--format', choices=('jsonl', 'csv'))
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Постов в одной транзакции',
+        )
+        parser.add_argument(
+            '--create-authors', action='store_true',
+            help='Заводить неизвестных авторов без пароля',
+        )
+        parser.add_argument(
+            '--images-dir', default='.',
+            help='Откуда брать картинки с относительными путями',
+        )
+        parser.add_argument(
+            '--image-workers', type=int, default=4,
+            help='Потоков для загрузки картинок',
+        )
+        parser.add_argument(
+            '--thumbnail-workers', type=int, default=os.cpu_count(),
+            help='Процессов для миниатюр; 0 — не создавать',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.storage = Post._meta.get_field('image').storage
+        self.authors = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.touched_authors = set()
+        self.touched_groups = set()
+        self.images = set()
+        imported = failed = 0
+        # Триггеры поиска не снимаются: база живая, и посты, созданные во
+        # время импорта, иначе не попали бы в индекс. Строки индекса
+        # пишутся в той же транзакции, что и пачка постов.
+        with ThreadPoolExecutor(max(options['image_workers'], 1)) as pool:
+            for batch in self.batches(self.rows()):
+                posts, errors = self.build(batch, pool)
+                failed += errors
+                # bulk_create заполняет pub_date через auto_now_add, поэтому
+                # даты из файла проставляются после вставки.
+                dates = [post.pub_date for post in posts]
+                with transaction.atomic():
+                    Post.objects.bulk_create(posts)
+                    self.set_pub_dates(posts, dates)
+                    for name, count in Counter(
+                            post.image.name for post in posts
+                            if post.image).items():
+                        retain(name, count)
+                imported += len(posts)
+                self.stdout.write(f'Импортировано: {imported}')
+        if imported:
+            self.finish()
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано: {imported}, пропущено: {failed}'))
+
+    def rows(self):
+        path = self.options['path']
+        file_format = self.options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl')
+        if path == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        else:
+            try:
+                stream = open(path, encoding='utf-8', newline='')
+            except OSError as error:
+                raise CommandError(error)
+        with stream:
+            if file_format == 'csv':
+                for number, row in enumerate(csv.DictReader(stream), 2):
+                    yield number, row
+                return
+            for number, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield number, json.loads(line)
+                except ValueError as error:
+                    yield number, RowError(f'неверный JSON: {error}')
+
+    def batches(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.options['batch_size']:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def build(self, batch, pool):
+        """Посты пачки; картинки загружаются параллельно.
+
+        Картинки сохраняются только для строк, прошедших проверку: иначе
+        от отклоненных строк в хранилище остались бы файлы без ссылок.
+        """
+        valid = []
+        errors = 0
+        for number, row in batch:
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                valid.append((number, self.make_post(row), row.get('image')))
+            except RowError as error:
+                errors += 1
+                self.stderr.write(f'Строка {number}: {error}')
+        images = pool.map(self.ingest, [path for _, _, path in valid])
+        posts = []
+        for (number, post, _), image in zip(valid, images):
+            if isinstance(image, RowError):
+                errors += 1
+                self.stderr.write(f'Строка {number}: {image}')
+                continue
+            if image is not None:
+                post.image, post.image_size = image
+                self.images.add(image[0])
+            self.touched_authors.add(post.author_id)
+            if post.group_id:
+                self.touched_groups.add(post.group_id)
+            posts.append(post)
+        return posts, errors
+
+    def make_post(self, row):
+        text = (row.get('text') or '').strip()
+        if not text:
+            raise RowError('пустой текст')
+        post = Post(text=text, author_id=self.author_id(row.get('author')))
+        group = row.get('group')
+        if group:
+            if group not in self.groups:
+                raise RowError(f'нет группы {group}')
+            post.group_id = self.groups[group]
+        if row.get('pub_date'):
+            post.pub_date = parse_datetime(row['pub_date'])
+            if post.pub_date is None:
+                raise RowError(f'неверная дата {row["pub_date"]}')
+            if timezone.is_naive(post.pub_date):
+                post.pub_date = timezone.make_aware(post.pub_date)
+        return post
+
+    def set_pub_dates(self, posts, dates):
+        if posts and posts[0].pk is None:
+            # SQLite не возвращает id из bulk_create. Транзакция держит
+            # блокировку записи, так что новые посты — последние по id.
+            pks = Post.objects.order_by('-pk').values_list(
+                'pk', flat=True)[:len(posts)]
+            for post, pk in zip(posts, reversed(list(pks))):
+                post.pk = pk
+        whens = [When(pk=post.pk, then=Value(date))
+                 for post, date in zip(posts, dates) if date is not None]
+        if whens:
+            Post.objects.filter(pk__in=[post.pk for post in posts]).update(
+                pub_date=Case(*whens, default=F('pub_date'),
+                              output_field=DateTimeField()))
+
+    def author_id(self, username):
+        if not username:
+            raise RowError('не указан автор')
+        if username not in self.authors:
+            if not self.options['create_authors']:
+                raise RowError(f'нет автора {username}')
+            user = User.objects.create(username=username,
+                                       password=make_password(None))
+            self.authors[username] = user.pk
+        return self.authors[username]
+
+    def ingest(self, path):
+        """(имя в хранилище, размер) или RowError; выполняется в потоке."""
+        if not path:
+            return None
+        path = os.path.join(self.options['images_dir'], path)
+        try:
+            with open(path, 'rb') as source:
+                image_format, size = probe(source)
+                check_image(image_format, size)
+                stripped = strip_metadata(File(source, name=path),
+                                          image_format)
+            with stripped:
+                name = self.storage.save(
+                    'posts/' + os.path.basename(path), stripped)
+                return name, stripped.size
+        except (OSError, ValidationError) as error:
+            return RowError(f'картинка {path}: {error}')
+
+    def finish(self):
+        """Производные данные — один раз на весь импорт."""
+        call_command('reconcile_counters', stdout=io.StringIO())
+        for author_id in self.touched_authors - timeline.heavy_authors():
+            timeline.backfill_followers(author_id)
+        namespaces = {pagecache.GLOBAL}
+        namespaces.update(
+            pagecache.author_ns(pk) for pk in self.touched_authors)
+        namespaces.update(
+            pagecache.group_ns(pk) for pk in self.touched_groups)
+        workers = self.options['thumbnail_workers']
+        if workers and self.images:
+            names = sorted(self.images)
+            with thumbnails.make_executor(workers) as pool:
+                for _ in pool.map(partial(thumbnails.generate, notify=False),
+                                  names):
+                    pass
+            for start in range(0, len(names), self.options['batch_size']):
+                namespaces |= thumbnails.touch_posts(
+                    names[start:start + self.options['batch_size']])
+        pagecache.bump(*namespaces)
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts import counters, timeline
+from posts.models import Follow, Post, PostCounter
+
+
+def actual_counts():
+    """Все счетчики, пересчитанные несколькими агрегатными запросами."""
+    totals = {counters.GLOBAL: Post.objects.count()}
+    by_group = Post.objects.exclude(group=None).values('group').annotate(
+        total=Count('pk')).order_by()
+    for row in by_group:
+        totals[counters.group_key(row['group'])] = row['total']
+    by_author = Post.objects.values('author').annotate(
+        total=Count('pk')).order_by()
+    for row in by_author:
+        totals[counters.author_key(row['author'])] = row['total']
+    # Посты тяжелых авторов домешиваются в ленту их счетчиками.
+    by_follower = Follow.objects.exclude(
+        author_id__in=timeline.heavy_authors()
+    ).values('user').annotate(total=Count('author__posts')).order_by()
+    for row in by_follower:
+        totals[counters.follower_key(row['user'])] = row['total']
+    return totals
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, ничего не записывая',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            totals = actual_counts()
+            stale = []
+            for counter in PostCounter.objects.select_for_update():
+                value = totals.pop(counter.key, 0)
+                if counter.value != value:
+                    self.stdout.write(
+                        f'{counter.key}: {counter.value} -> {value}')
+                    counter.value = value
+                    stale.append(counter)
+            missing = [PostCounter(key=key, value=value)
+                       for key, value in totals.items()]
+            if not options['dry_run']:
+                PostCounter.objects.bulk_update(
+                    stale, ['value'], batch_size=counters.BATCH_SIZE)
+                PostCounter.objects.bulk_create(
+                    missing, batch_size=counters.BATCH_SIZE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено: {len(stale)}, создано: {len(missing)}'))
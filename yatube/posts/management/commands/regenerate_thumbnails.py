@@ -0,0 +1,144 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import pagecache, thumbnails
+from posts.models import Post
+
+STATE_FILE = os.path.join(settings.BASE_DIR, 'cache',
+                          'regenerate_thumbnails.state')
+
+
+class Command(BaseCommand):
+    help = ('Заново создает миниатюры и варианты всех картинок постов '
+            'в пуле процессов')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=200,
+            help='Сколько картинок читать из БД за раз',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов; 0 — все в текущем процессе',
+        )
+        parser.add_argument(
+            '--max-mb-per-sec', type=float, default=None,
+            help='Ограничение чтения исходников, МБ/с',
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить с места, где остановился прошлый запуск',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Удалить существующие миниатюры и варианты',
+        )
+        parser.add_argument('--state-file', default=STATE_FILE)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.cap = options['max_mb_per_sec']
+        last = self.load_state() if options['resume'] else ''
+        images = Post.objects.exclude(image='').order_by(
+            'image').values_list('image', flat=True).distinct()
+        total = images.count()
+        done = images.filter(image__lte=last).count() if last else 0
+        self.read = 0
+        self.failed = 0
+        self.namespaces = set()
+        self.started = time.monotonic()
+        pool = None
+        if options['workers']:
+            pool = thumbnails.make_executor(options['workers'])
+        try:
+            while True:
+                chunk = list(images.filter(image__gt=last)[
+                    :options['chunk_size']])
+                if not chunk:
+                    break
+                self.ready = []
+                self.run_chunk(pool, chunk)
+                # modified обновляется по пачкам, чтобы прерванный запуск
+                # не оставил карточек с заглушками; страницы сбрасываются
+                # один раз в конце.
+                if self.ready:
+                    self.namespaces |= thumbnails.touch_posts(self.ready)
+                last = chunk[-1]
+                done += len(chunk)
+                self.save_state(last)
+                self.report(done, total)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            pagecache.bump(*self.namespaces)
+        if os.path.exists(options['state_file']):
+            os.remove(options['state_file'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done}, ошибок: {self.failed}'))
+
+    def run_chunk(self, pool, chunk):
+        force = self.options['force']
+        if pool is None:
+            for name in chunk:
+                self.throttle()
+                self.collect(lambda: thumbnails.regenerate(name, force), name)
+            return
+        # В очереди не больше двух картинок на процесс, чтобы
+        # ограничение скорости срабатывало вовремя.
+        pending = set()
+        window = 2 * self.options['workers']
+        for name in chunk:
+            self.throttle()
+            if len(pending) >= window:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                self.collect_futures(finished)
+            future = pool.submit(thumbnails.regenerate, name, force)
+            future.image_name = name
+            pending.add(future)
+        self.collect_futures(wait(pending).done)
+
+    def collect_futures(self, futures):
+        for future in futures:
+            self.collect(future.result, future.image_name)
+
+    def collect(self, result, name):
+        try:
+            self.read += result()
+        except Exception as error:
+            self.failed += 1
+            self.stderr.write(f'{name}: {error}')
+        else:
+            self.ready.append(name)
+
+    def throttle(self):
+        if not self.cap:
+            return
+        # Средняя скорость не выше cap: спим, пока прочитанное
+        # не уложится в отведенное время.
+        ahead = (self.read / (self.cap * 1024 * 1024)
+                 - (time.monotonic() - self.started))
+        if ahead > 0:
+            time.sleep(ahead)
+
+    def report(self, done, total):
+        elapsed = time.monotonic() - self.started
+        speed = self.read / 1024 / 1024 / elapsed if elapsed else 0
+        self.stdout.write(f'{done}/{total} картинок, {speed:.1f} МБ/с, '
+                          f'ошибок: {self.failed}')
+
+    def load_state(self):
+        try:
+            with open(self.options['state_file']) as state:
+                return state.read().strip()
+        except FileNotFoundError:
+            return ''
+
+    def save_state(self, last):
+        os.makedirs(os.path.dirname(self.options['state_file']),
+                    exist_ok=True)
+        with open(self.options['state_file'], 'w') as state:
+            state.write(last)
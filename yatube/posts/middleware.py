@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from core.cache.stampede import get_or_refresh
+
+from . import pagecache
+
+# Представления, которые вызывают pagecache.depends_on(). Остальные
+# запросы не должны ждать чужой блокировки ради страницы, которая
+# все равно не сохранится.
+CACHED_VIEWS = ('posts:index', 'posts:group', 'posts:profile',
+                'posts:post_detail')
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдает анонимам целые страницы из кэша.
+
+    Кэшируются только ответы представлений, вызвавших
+    pagecache.depends_on(); сигналы моделей сбрасывают версии
+    пространств имен. Устаревшую страницу перестраивает один процесс,
+    остальные пока отдают прежнюю.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_cacheable(request):
+            return self.get_response(request)
+        request.page_cacheable = True
+        rendered = []
+
+        def render():
+            response = self.get_response(request)
+            rendered.append(response)
+            if not self.should_store(request, response):
+                return None
+            return pagecache.snapshot(request, (
+                response.content, response.status_code,
+                list(response.items())))
+
+        entry = get_or_refresh(
+            pagecache.page_key(request), render,
+            getattr(settings, 'PAGE_CACHE_TIMEOUT', 600),
+            validate=pagecache.is_current,
+        )
+        if rendered:
+            return rendered[0]
+        content, status, headers = entry[1]
+        response = HttpResponse(content, status=status)
+        for header, value in headers:
+            response[header] = value
+        response['X-Page-Cache'] = 'hit'
+        return get_conditional_response(
+            request, etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')),
+            response=response)
+
+    def is_cacheable(self, request):
+        return (
+            getattr(settings, 'PAGE_CACHE_ENABLED', True)
+            and request.method in ('GET', 'HEAD')
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and self.view_name(request) in getattr(
+                settings, 'PAGE_CACHE_VIEWS', CACHED_VIEWS)
+        )
+
+    def view_name(self, request):
+        try:
+            return resolve(request.path_info).view_name
+        except Resolver404:
+            return None
+
+    def should_store(self, request, response):
+        return (
+            getattr(request, 'page_cache_versions', None)
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        )
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_follow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('value', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
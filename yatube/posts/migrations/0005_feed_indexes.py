@@ -0,0 +1,52 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:37
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def dedupe_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    PostCounter = apps.get_model('posts', 'PostCounter')
+    duplicates = Follow.objects.values('user', 'author').annotate(
+        keep=Min('pk'), total=Count('pk')).filter(total__gt=1).order_by()
+    for row in duplicates.iterator():
+        Follow.objects.filter(
+            user=row['user'], author=row['author']
+        ).exclude(pk=row['keep']).delete()
+        # Ленту считали с дублями, пусть пересчитается при чтении.
+        PostCounter.objects.filter(key=f'follower:{row["user"]}').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ['created']},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date'], name='post_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date'], name='post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date'], name='post_group_date_idx'),
+        ),
+        migrations.RunPython(dedupe_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
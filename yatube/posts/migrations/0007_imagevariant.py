@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(db_index=True, max_length=255)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('format', models.CharField(max_length=8)),
+                ('file', models.ImageField(upload_to='posts/variants/')),
+            ],
+            options={
+                'ordering': ['width'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='imagevariant',
+            constraint=models.UniqueConstraint(fields=('source', 'width', 'format'), name='unique_image_variant'),
+        ),
+    ]
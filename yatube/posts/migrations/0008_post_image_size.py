@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:48
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def fill_image_size(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    for post in Post.objects.exclude(image='').only('pk', 'image'):
+        try:
+            size = default_storage.size(post.image.name)
+        except OSError:
+            continue
+        Post.objects.filter(pk=post.pk).update(image_size=size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_imagevariant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_size',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_image_size, migrations.RunPython.noop),
+    ]
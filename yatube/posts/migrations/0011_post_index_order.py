@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_search'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_author_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_group_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['pub_date'], name='post_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date'], name='post_group_date_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:10
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_pub_dates(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    TimelineEntry.objects.update(pub_date=Subquery(
+        Post.objects.filter(pk=OuterRef('post_id')).values('pub_date')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_index_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timelineentry',
+            name='pub_date',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(copy_pub_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='timelineentry',
+            name='pub_date',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'pub_date', 'post'], name='timeline_user_date_idx'),
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
 from django.contrib.auth import get_user_model
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -13,9 +16,39 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        return self.select_related('author', 'group')
+
+    def after(self, pub_date, pk):
+        """Посты старше (pub_date, pk); порядок задает вызывающий."""
+        # Один диапазон индекса вместо OR двух: иначе SQLite объединяет
+        # их и сортирует всю выборку во временном B-дереве.
+        return self.filter(pub_date__lte=pub_date).exclude(
+            pub_date=pub_date, pk__gte=pk)
+
+    def before(self, pub_date, pk):
+        """Посты новее (pub_date, pk)."""
+        return self.filter(pub_date__gte=pub_date).exclude(
+            pub_date=pub_date, pk__lte=pk)
+
+    def for_detail(self):
+        author_posts = Post.objects.filter(
+            author=OuterRef('author')
+        ).order_by().values('author').annotate(
+            total=Count('pk')
+        ).values('total')
+        comments = Comment.objects.select_related('author')
+        return self.for_feed().annotate(
+            author_posts_count=Subquery(author_posts,
+                                        output_field=IntegerField())
+        ).prefetch_related(Prefetch('comments', queryset=comments))
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст поста')
     pub_date = models.DateTimeField(auto_now_add=True)
+    modified = models.DateTimeField(auto_now=True)
     group = models.ForeignKey(
         Group,
         blank=True,
@@ -33,12 +66,26 @@ class Post(models.Model):
         'Картинка',
         upload_to='posts/',
         blank=True,
+        storage=ContentAddressedStorage(),
     )
+    image_size = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Индексы по возрастанию: в SQLite запись индекса заканчивается
+        # rowid (= id), и обратный проход отдает порядок
+        # (-pub_date, -id) без сортировки, нужный CursorPaginator.
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_date_idx'),
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_date_idx'),
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -56,9 +103,78 @@ class Comment(models.Model):
 
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        ordering = ['created']
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE,
                              related_name='follower')
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='following')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+
+
+class PostCounter(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    value = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.key}={self.value}'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    # Копия post.pub_date: страница ленты читается из индекса записей
+    # без обращения к постам и сортировки.
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'pub_date', 'post'],
+                         name='timeline_user_date_idx'),
+        ]
+
+
+class ImageVariant(models.Model):
+    """Уменьшенная копия картинки поста одной ширины и формата."""
+    source = models.CharField(max_length=255, db_index=True)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    format = models.CharField(max_length=8)
+    file = models.ImageField(upload_to='posts/variants/')
+
+    class Meta:
+        ordering = ['width']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'width', 'format'],
+                                    name='unique_image_variant'),
+        ]
+
+    def __str__(self):
+        return f'{self.source} {self.width}w {self.format}'
+
+
+class StoredFile(models.Model):
+    """Сколько постов ссылается на файл в ContentAddressedStorage."""
+    name = models.CharField(max_length=255, unique=True)
+    refs = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name} ({self.refs})'
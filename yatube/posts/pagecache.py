@@ -0,0 +1,154 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, urlencode
+
+GLOBAL = 'global'
+VERSION_KEY = 'pagecache:ns:{}'
+PAGE_KEY = 'pagecache:page:{}'
+LAST_MODIFIED_KEY = 'pagecache:last_modified:{}'
+LAST_MODIFIED_TIMEOUT = 24 * 60 * 60
+POST_AUTHOR_KEY = 'posts:post_author:{}'
+POST_AUTHOR_TIMEOUT = 24 * 60 * 60
+# Параметры запроса, которые читают кэшируемые представления.
+QUERY_PARAMS = ('page',)
+
+
+def group_ns(group_id):
+    return f'group:{group_id}'
+
+
+def author_ns(author_id):
+    return f'author:{author_id}'
+
+
+def post_ns(post_id):
+    return f'post:{post_id}'
+
+
+def post_author(post_id):
+    """Автор поста из кэша: с ним post_detail отвечает 304 без запросов."""
+    return cache.get(POST_AUTHOR_KEY.format(post_id))
+
+
+def remember_post_author(post):
+    cache.set(POST_AUTHOR_KEY.format(post.pk), post.author_id,
+              POST_AUTHOR_TIMEOUT)
+
+
+def forget_post_author(post_id):
+    cache.delete(POST_AUTHOR_KEY.format(post_id))
+
+
+def _initial_version():
+    # Версия от времени: вытесненная и заново заведенная версия
+    # не совпадет с той, под которой страница была сохранена.
+    return int(time.time() * 1000)
+
+
+def versions(namespaces):
+    keys = {VERSION_KEY.format(ns): ns for ns in namespaces}
+    found = cache.get_many(keys)
+    current = {keys[key]: value for key, value in found.items()}
+    for key, ns in keys.items():
+        if key not in found:
+            version = _initial_version()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+            current[ns] = version
+    return current
+
+
+def bump(*namespaces):
+    """Сбрасывает все страницы, зависящие от пространств имен."""
+    for ns in namespaces:
+        key = VERSION_KEY.format(ns)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def depends_on(request, *namespaces):
+    """Разрешает кэшировать ответ анонимам; вызывается из представления.
+
+    Версии запоминаются до чтения данных: если пост изменится, пока
+    страница строится, она сохранится уже устаревшей и не найдется.
+    """
+    if (getattr(request, 'page_cacheable', False)
+            and not getattr(request, 'replica_reads', False)):
+        request.page_cache_versions = versions(namespaces)
+
+
+def page_key(request):
+    """Ключ по пути и известным параметрам: ?utm_source= и прочие
+    метки не плодят копий одной и той же страницы."""
+    query = urlencode([(name, value) for name in QUERY_PARAMS
+                       for value in request.GET.getlist(name)])
+    return PAGE_KEY.format(f'{request.path}?{query}')
+
+
+def snapshot(request, page):
+    """Страница вместе с версиями, под которыми она построена."""
+    return request.page_cache_versions, page
+
+
+def is_current(entry):
+    page_versions, _ = entry
+    return versions(page_versions) == page_versions
+
+
+def viewer(request):
+    """То, что меняет разметку страницы для вошедшего пользователя."""
+    if not request.user.is_authenticated:
+        return None
+    return (request.user.pk, request.user.get_username(),
+            request.META.get('CSRF_COOKIE'))
+
+
+def not_modified(request, *namespaces, extra=(), personal=True):
+    """304, если у клиента актуальная страница; вызывается до запросов.
+
+    ETag строится из версий пространств имен, поэтому проверка стоит
+    одного обращения к кэшу. Last-Modified запоминается под ETag в
+    validated(), так что If-Modified-Since проверяется так же дешево.
+    personal=False — ответ одинаков для всех пользователей.
+    """
+    current = sorted(versions(namespaces).items())
+    raw = repr((request.get_full_path(), current,
+                viewer(request) if personal else None, extra))
+    request.page_etag = '"{}"'.format(
+        hashlib.sha256(raw.encode()).hexdigest()[:32])
+    request.page_last_modified = cache.get(
+        LAST_MODIFIED_KEY.format(request.page_etag))
+    response = get_conditional_response(
+        request, etag=request.page_etag,
+        last_modified=request.page_last_modified)
+    if response is not None:
+        _set_validators(request, response)
+    return response
+
+
+def validated(request, response, dates=()):
+    """Ставит ETag и Last-Modified по самой поздней из дат ответа.
+
+    Ответ, прочитанный с реплики, валидаторов не получает: она может
+    отставать от версий, под которыми построен ETag.
+    """
+    if (getattr(request, 'page_etag', None) is None
+            or getattr(request, 'replica_reads', False)):
+        return response
+    if dates:
+        request.page_last_modified = int(max(dates).timestamp())
+        cache.set(LAST_MODIFIED_KEY.format(request.page_etag),
+                  request.page_last_modified, LAST_MODIFIED_TIMEOUT)
+    _set_validators(request, response)
+    return response
+
+
+def _set_validators(request, response):
+    response['ETag'] = request.page_etag
+    if request.page_last_modified is not None:
+        response['Last-Modified'] = http_date(request.page_last_modified)
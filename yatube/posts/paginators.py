@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.utils.functional import cached_property
+
+from .counters import get_count
+
+POSTS_PER_PAGE = 10
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+NEXT = 'n'
+PREVIOUS = 'p'
+LAST = 'last'
+
+
+def encode_cursor(direction, post):
+    """Курсор вида n1633171200123456-42: направление, pub_date в мкс, id."""
+    stamp = (post.pub_date - EPOCH) // MICROSECOND
+    return f'{direction}{stamp}-{post.pk}'
+
+
+def decode_cursor(token):
+    """Возвращает (направление, pub_date, id) или None для мусора."""
+    if not isinstance(token, str) or token[:1] not in (NEXT, PREVIOUS):
+        return None
+    stamp, _, pk = token[1:].partition('-')
+    if not (stamp.isdigit() and pk.isdigit()):
+        return None
+    return token[0], EPOCH + int(stamp) * MICROSECOND, int(pk)
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинации, совместимая с includes/paginator.html.
+
+    Вместо номеров страниц шаблон получает курсоры, поэтому ссылки
+    ?page={{ page_obj.next_page_number }} продолжают работать.
+    """
+
+    def __init__(self, object_list, paginator, has_previous, has_next):
+        super().__init__(object_list, None, paginator)
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return '<CursorPage of %s posts>' % len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_page_number(self):
+        return encode_cursor(NEXT, self.object_list[-1])
+
+    def previous_page_number(self):
+        return encode_cursor(PREVIOUS, self.object_list[0])
+
+    def start_index(self):
+        return None
+
+    def end_index(self):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по (pub_date, id) без OFFSET и COUNT(*).
+
+    Каждая страница — один запрос LIMIT per_page + 1 по индексу, поэтому
+    время ответа не зависит от глубины. Общее число записей неизвестно:
+    page_range пуст, а num_pages — курсор на последнюю страницу.
+    object_list — PostQuerySet или timeline.Feed: оба умеют after/before.
+    """
+
+    ordering = ('-pub_date', '-pk')
+
+    def __init__(self, object_list, per_page):
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    @property
+    def num_pages(self):
+        return LAST
+
+    @property
+    def page_range(self):
+        return range(0)
+
+    def get_page(self, token):
+        if token == LAST:
+            return self._last_page()
+        cursor = decode_cursor(token)
+        if cursor is None:
+            return self._first_page()
+        direction, pub_date, pk = cursor
+        if direction == NEXT:
+            return self._page_after(pub_date, pk)
+        return self._page_before(pub_date, pk)
+
+    def page(self, token):
+        return self.get_page(token)
+
+    def _slice(self, queryset):
+        return list(queryset[:self.per_page + 1])
+
+    def _first_page(self):
+        posts = self._slice(self.object_list)
+        return CursorPage(posts[:self.per_page], self,
+                          False, len(posts) > self.per_page)
+
+    def _last_page(self):
+        posts = self._slice(self.object_list.reverse())
+        return CursorPage(posts[:self.per_page][::-1], self,
+                          len(posts) > self.per_page, False)
+
+    def after(self, pub_date, pk):
+        """Посты старше курсора, от новых к старым."""
+        return self.object_list.after(pub_date, pk)
+
+    def before(self, pub_date, pk):
+        """Посты новее курсора, от старых к новым."""
+        return self.object_list.reverse().before(pub_date, pk)
+
+    def _page_after(self, pub_date, pk):
+        posts = self._slice(self.after(pub_date, pk))
+        if not posts:
+            return self._last_page()
+        return CursorPage(posts[:self.per_page], self,
+                          True, len(posts) > self.per_page)
+
+    def _page_before(self, pub_date, pk):
+        posts = self._slice(self.before(pub_date, pk))
+        if len(posts) <= self.per_page:
+            return self._first_page()
+        return CursorPage(posts[:self.per_page][::-1], self, True, True)
+
+
+class CountedPaginator(Paginator):
+    """Paginator, берущий число постов из PostCounter вместо COUNT(*)."""
+
+    def __init__(self, object_list, per_page, count_key):
+        super().__init__(object_list, per_page)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        return get_count(self.count_key, self.object_list)
+
+
+def paginate(request, post_list, count_key=None):
+    """Страница ленты по ?page=; режим выбирает POSTS_CURSOR_PAGINATION."""
+    if getattr(settings, 'POSTS_CURSOR_PAGINATION', False):
+        paginator = CursorPaginator(post_list, POSTS_PER_PAGE)
+    elif count_key is not None:
+        paginator = CountedPaginator(post_list, POSTS_PER_PAGE, count_key)
+    else:
+        paginator = Paginator(post_list, POSTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('page'))
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import tempfile
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from PIL import Image, ImageOps
+
+from core.cache.stampede import LOCK_KEY, POLL_INTERVAL, acquire, release
+
+from .thumbnails import image_storage
+
+SALT = 'posts.resize'
+LOCK_TIMEOUT = 30
+SAVE_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+
+
+def geometries():
+    """Разрешенные параметры: 'ШxВ' вписывает, 'ШxВ-crop' обрезает."""
+    return getattr(settings, 'POST_RESIZE_GEOMETRIES',
+                   ('200x200-crop', '320x240', '640x480', '1280x720'))
+
+
+def signature(params, name):
+    return signing.Signer(salt=SALT).signature(f'{params}/{name}')
+
+
+def resize_url(name, params):
+    if params not in geometries():
+        raise ValueError(f'Geometry {params!r} is not allowed')
+    signed = f'{params}:{signature(params, name)}'
+    return reverse('posts:resize_image', args=[signed, name])
+
+
+def unsign(signed, name):
+    """Параметры из подписанной части URL или None."""
+    params, _, sig = signed.rpartition(':')
+    if params not in geometries():
+        return None
+    if not constant_time_compare(sig, signature(params, name)):
+        return None
+    return params
+
+
+def etag(params, name):
+    # Имена картинок не переиспользуются, поэтому ответ по URL неизменен.
+    return '"{}"'.format(
+        hashlib.sha256(f'{params}/{name}'.encode()).hexdigest()[:32])
+
+
+def resized_name(params, name):
+    prefix = getattr(settings, 'POST_RESIZE_CACHE', 'cache/resize')
+    return f'{prefix}/{params}/{name}'
+
+
+def render(params, source):
+    geometry, _, mode = params.partition('-')
+    size = tuple(int(side) for side in geometry.split('x'))
+    image = Image.open(source)
+    image_format = image.format if image.format in SAVE_FORMATS else 'PNG'
+    if image_format == 'JPEG':
+        image = image.convert('RGB')
+    if mode == 'crop':
+        image = ImageOps.fit(image, size, Image.LANCZOS)
+    else:
+        image.thumbnail(size, Image.LANCZOS)
+    content = BytesIO()
+    image.save(content, image_format)
+    return content.getvalue()
+
+
+def write_atomic(path, content):
+    # Файл появляется целиком: читатели не увидят его недописанным.
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tmp:
+        tmp.write(content)
+    os.chmod(tmp.name, 0o644)
+    os.replace(tmp.name, path)
+
+
+def resize(params, name):
+    """Имя файла с уменьшенной картинкой в кэше на диске.
+
+    Один и тот же вариант одновременно считает только один процесс,
+    остальные ждут, пока файл появится.
+    """
+    # Кэш лежит в обычном хранилище: по содержимому его не адресуем.
+    storage = default_storage
+    target = resized_name(params, name)
+    if storage.exists(target):
+        return target
+    lock_key = LOCK_KEY.format(
+        'resize:' + hashlib.sha1(target.encode()).hexdigest())
+    deadline = time.time() + LOCK_TIMEOUT
+    token = acquire(lock_key, LOCK_TIMEOUT)
+    while token is None:
+        time.sleep(POLL_INTERVAL)
+        if storage.exists(target):
+            return target
+        if time.time() > deadline:
+            break
+        token = acquire(lock_key, LOCK_TIMEOUT)
+    try:
+        if not storage.exists(target):
+            with image_storage().open(name) as source:
+                content = render(params, source)
+            write_atomic(storage.path(target), content)
+        return target
+    finally:
+        release(lock_key, token)
+
+
+def forget(name):
+    for params in geometries():
+        default_storage.delete(resized_name(params, name))
@@ -0,0 +1,152 @@
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+TABLE = 'posts_post_fts'
+# Маркеры подсветки из snippet(); текст поста экранируется, они — нет.
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 16
+TOKEN = re.compile(r'\w+')
+
+INSTALL_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+        text, author_id UNINDEXED, group_id UNINDEXED,
+        content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {TABLE}(rowid, text, author_id, group_id)
+        VALUES (new.id, new.text, new.author_id, new.group_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, text, author_id, group_id)
+        VALUES ('delete', old.id, old.text, old.author_id, old.group_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS posts_post_fts_update
+    AFTER UPDATE OF text, author_id, group_id ON posts_post BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, text, author_id, group_id)
+        VALUES ('delete', old.id, old.text, old.author_id, old.group_id);
+        INSERT INTO {TABLE}(rowid, text, author_id, group_id)
+        VALUES (new.id, new.text, new.author_id, new.group_id);
+    END""",
+]
+TRIGGERS = ('posts_post_fts_insert', 'posts_post_fts_delete',
+            'posts_post_fts_update')
+
+
+def install(using_connection):
+    """Создает индекс и триггеры, если их нет, и при этом
+    перестраивает индекс.
+
+    SQLite пересоздает таблицу при многих ALTER в миграциях, и триггеры
+    на posts_post пропадают; поэтому вызывается после каждого migrate.
+    """
+    if using_connection.vendor != 'sqlite':
+        return
+    with using_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' "
+            'AND name IN (%s, %s, %s)', TRIGGERS)
+        if cursor.fetchone()[0] == len(TRIGGERS):
+            return
+        for sql in INSTALL_SQL:
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(using_connection):
+    if using_connection.vendor != 'sqlite':
+        return
+    with using_connection.cursor() as cursor:
+        for trigger in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+def match_expression(query):
+    """Запрос пользователя как выражение FTS5: все слова, последнее —
+    по префиксу. Операторы FTS5 из ввода не проходят.
+    """
+    words = TOKEN.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(MARK_START, '<mark>')
+                     .replace(MARK_END, '</mark>'))
+
+
+def matching_ids_sql():
+    return f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s'
+
+
+class SearchResults:
+    """Ранжированные посты по запросу; нарезается Paginator'ом.
+
+    Каждый срез — один запрос к индексу за id, ранг и фрагмент текста
+    и один запрос за самими постами.
+    """
+
+    def __init__(self, query, author_id=None, group_id=None):
+        self.match = match_expression(query)
+        self.where = f'{TABLE} MATCH %s'
+        self.params = [self.match]
+        if author_id is not None:
+            self.where += ' AND author_id = %s'
+            self.params.append(author_id)
+        if group_id is not None:
+            self.where += ' AND group_id = %s'
+            self.params.append(group_id)
+
+    def count(self):
+        if self.match is None:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {TABLE} WHERE {self.where}',
+                self.params)
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, bounds):
+        from .models import Post
+        if self.match is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, snippet({TABLE}, 0, %s, %s, '…', %s) "
+                f'FROM {TABLE} WHERE {self.where} '
+                f'ORDER BY bm25({TABLE}) LIMIT %s OFFSET %s',
+                [MARK_START, MARK_END, SNIPPET_TOKENS, *self.params,
+                 bounds.stop - bounds.start, bounds.start])
+            rows = cursor.fetchall()
+        posts = Post.objects.for_feed().in_bulk([pk for pk, _ in rows])
+        results = []
+        for pk, snippet in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
+
+    def facet(self, column, limit=10):
+        """[(id, число совпадений)] по автору или группе."""
+        if self.match is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {column}, count(*) AS total FROM {TABLE} '
+                f'WHERE {self.where} AND {column} IS NOT NULL '
+                f'GROUP BY {column} ORDER BY total DESC LIMIT %s',
+                [*self.params, limit])
+            return cursor.fetchall()
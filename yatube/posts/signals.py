@@ -0,0 +1,226 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import autocomplete, counters, pagecache, storage, timeline
+from .models import Comment, Follow, Group, Post, PostCounter
+
+User = get_user_model()
+
+# Поля пользователя, которые видны на страницах, в API и лентах.
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved(sender, instance, **kwargs):
+    instance._saved_group_id = None
+    instance._saved_image = ''
+    if instance.pk is not None:
+        saved = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image').first()
+        if saved is not None:
+            instance._saved_group_id, instance._saved_image = saved
+
+
+def _change_followers(author_id, delta):
+    # Посты тяжелого автора не входят в счетчики подписчиков, а обход
+    # тысяч подписчиков на каждый пост и был бы самым дорогим.
+    if not timeline.is_heavy(author_id):
+        counters.change(counters.follower_keys(author_id), delta)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        counters.change(counters.post_keys(instance), 1)
+        _change_followers(instance.author_id, 1)
+        return
+    old_group_id = getattr(instance, '_saved_group_id', None)
+    if old_group_id != instance.group_id:
+        if old_group_id is not None:
+            counters.change([counters.group_key(old_group_id)], -1)
+        if instance.group_id is not None:
+            counters.change([counters.group_key(instance.group_id)], 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change(counters.post_keys(instance), -1)
+    _change_followers(instance.author_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def count_image_refs(sender, instance, **kwargs):
+    old_image = getattr(instance, '_saved_image', '')
+    if old_image != instance.image.name:
+        storage.retain(instance.image.name)
+        storage.release(old_image, instance.image.storage)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    storage.release(instance.image.name, instance.image.storage)
+
+
+def _follow_delta(follow, followers):
+    """Ключ и сдвиг счетчика ленты при followers подписчиках автора."""
+    key = counters.follower_key(follow.user_id)
+    if (followers > timeline.fanout_limit()
+            or not PostCounter.objects.filter(key=key).exists()):
+        return None, 0
+    author_posts = counters.get_count(
+        counters.author_key(follow.author_id),
+        Post.objects.filter(author_id=follow.author_id))
+    return key, author_posts
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        key, delta = _follow_delta(
+            instance, timeline.followers_count(instance.author_id))
+        if key:
+            counters.change([key], delta)
+
+
+@receiver(post_delete, sender=Follow)
+def count_unfollow(sender, instance, **kwargs):
+    # Тяжелым ли автор был до отписки.
+    key, delta = _follow_delta(
+        instance, timeline.followers_count(instance.author_id) + 1)
+    if key:
+        counters.change([key], -delta)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if not created:
+        return
+    if not timeline.sync_heavy(instance.author_id):
+        timeline.backfill(instance.user_id, instance.author_id)
+    elif timeline.has_entries(instance.author_id):
+        timeline.trim_followers(instance.author_id)
+        counters.forget(counters.follower_keys(instance.author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timeline.trim(instance.user_id, instance.author_id)
+    if (not timeline.sync_heavy(instance.author_id)
+            and timeline.has_gaps(instance.author_id)):
+        timeline.backfill_followers(instance.author_id)
+        counters.forget(counters.follower_keys(instance.author_id))
+
+
+def _post_namespaces(post):
+    namespaces = [pagecache.GLOBAL, pagecache.author_ns(post.author_id),
+                  pagecache.post_ns(post.pk)]
+    for group_id in {post.group_id, getattr(post, '_saved_group_id', None)}:
+        if group_id is not None:
+            namespaces.append(pagecache.group_ns(group_id))
+    return namespaces
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def expire_post_pages(sender, instance, **kwargs):
+    pagecache.bump(*_post_namespaces(instance))
+
+
+@receiver(post_delete, sender=Post)
+def forget_post_author(sender, instance, **kwargs):
+    pagecache.forget_post_author(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def expire_comment_pages(sender, instance, **kwargs):
+    pagecache.bump(pagecache.post_ns(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def expire_follow_pages(sender, instance, **kwargs):
+    pagecache.bump(pagecache.author_ns(instance.author_id))
+
+
+def _group_namespaces(group):
+    """Все страницы, где видны название или адрес группы."""
+    namespaces = {pagecache.GLOBAL, pagecache.group_ns(group.pk)}
+    for post_id, author_id in group.posts.values_list('pk', 'author_id'):
+        namespaces.update((pagecache.post_ns(post_id),
+                           pagecache.author_ns(author_id)))
+    return namespaces
+
+
+@receiver(post_save, sender=Group)
+def expire_group_pages(sender, instance, **kwargs):
+    pagecache.bump(*_group_namespaces(instance))
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_pages(sender, instance, **kwargs):
+    # После удаления у постов уже не будет группы.
+    instance._page_namespaces = _group_namespaces(instance)
+
+
+@receiver(post_delete, sender=Group)
+def expire_deleted_group_pages(sender, instance, **kwargs):
+    pagecache.bump(*getattr(instance, '_page_namespaces', ()))
+
+
+@receiver(post_save, sender=Group)
+def index_group(sender, instance, **kwargs):
+    autocomplete.changed(autocomplete.GROUP, instance.pk)
+
+
+@receiver(post_delete, sender=Group)
+def unindex_group(sender, instance, **kwargs):
+    autocomplete.changed(autocomplete.GROUP, instance.pk)
+
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, update_fields=None, **kwargs):
+    # Вход сохраняет только last_login — индекс не трогаем.
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    autocomplete.changed(autocomplete.USER, instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def unindex_user(sender, instance, **kwargs):
+    autocomplete.changed(autocomplete.USER, instance.pk)
+
+
+@receiver(pre_save, sender=User)
+def remember_author_names(sender, instance, update_fields=None, **kwargs):
+    instance._saved_names = None
+    if instance.pk is None or (update_fields is not None
+                               and not set(AUTHOR_FIELDS) & update_fields):
+        return
+    instance._saved_names = User.objects.filter(pk=instance.pk).values_list(
+        *AUTHOR_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def expire_author_pages(sender, instance, created, **kwargs):
+    """Смена имени видна на всех страницах с постами и комментариями
+    автора, а карточки и modified постов от нее не меняются."""
+    saved = getattr(instance, '_saved_names', None)
+    names = tuple(getattr(instance, field) for field in AUTHOR_FIELDS)
+    if created or saved is None or saved == names:
+        return
+    namespaces = {pagecache.GLOBAL, pagecache.author_ns(instance.pk)}
+    group_ids = instance.posts.exclude(group=None).values_list(
+        'group_id', flat=True).distinct()
+    namespaces.update(pagecache.group_ns(pk) for pk in group_ids)
+    post_ids = instance.comments.values_list('post_id', flat=True).distinct()
+    namespaces.update(pagecache.post_ns(pk) for pk in post_ids)
+    pagecache.bump(*namespaces)
@@ -0,0 +1,81 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+# posts/ab/cd/<sha256>.<ext>
+ADDRESSED_NAME = re.compile(
+    r'(^|/)([0-9a-f]{2})/([0-9a-f]{2})/\2\3[0-9a-f]{60}(\.\w+)?$')
+
+
+def is_content_addressed(name):
+    return bool(name) and ADDRESSED_NAME.search(name) is not None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файл под именем из SHA-256 содержимого.
+
+    Две первые пары символов хэша дают вложенные каталоги, чтобы в
+    одном каталоге не копились сотни тысяч файлов. Одинаковое
+    содержимое сохраняется один раз; сколько постов на файл ссылается,
+    считает StoredFile.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        checksum = digest.hexdigest()
+        ext = os.path.splitext(name)[1].lower()
+        return os.path.join(os.path.dirname(name), checksum[:2],
+                            checksum[2:4], checksum + ext)
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        saved = super()._save(name, content)
+        if saved != name:
+            # Тот же файл успели записать параллельно.
+            self.delete(saved)
+        return name
+
+
+def retain(name, count=1):
+    from .models import StoredFile
+    if not is_content_addressed(name):
+        return
+    StoredFile.objects.get_or_create(name=name)
+    StoredFile.objects.filter(name=name).update(refs=F('refs') + count)
+
+
+def release(name, storage):
+    """Снимает ссылку; последний владелец удаляет файл после коммита."""
+    from .models import StoredFile
+    if not is_content_addressed(name):
+        return
+    StoredFile.objects.filter(name=name).update(refs=F('refs') - 1)
+    orphan = StoredFile.objects.filter(name=name, refs__lte=0)
+    if orphan.exists():
+        orphan.delete()
+        transaction.on_commit(lambda: delete_media(name, storage))
+
+
+def delete_media(name, storage):
+    from sorl.thumbnail import delete
+    from sorl.thumbnail.images import ImageFile
+    from . import resize
+    from .models import ImageVariant, StoredFile
+    if StoredFile.objects.filter(name=name).exists():
+        return
+    for variant in ImageVariant.objects.filter(source=name):
+        variant.file.delete(save=False)
+        variant.delete()
+    resize.forget(name)
+    delete(ImageFile(name, storage))
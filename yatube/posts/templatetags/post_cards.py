@@ -0,0 +1,11 @@
+from django import template
+
+from ..cards import attach_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def attach_post_cards(page_obj):
+    attach_cards(page_obj[:])
+    return ''
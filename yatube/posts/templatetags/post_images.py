@@ -0,0 +1,27 @@
+from django import template
+
+from .. import resize, thumbnails, variants
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, spec='card'):
+    """Готовая миниатюра или None — картинка никогда не ужимается тут.
+
+    Если лента заранее вызвала prefetch_thumbnails, хранилище sorl
+    повторно не опрашивается.
+    """
+    return thumbnails.post_thumbnail(post, spec)
+
+
+@register.simple_tag
+def post_responsive_image(post):
+    """Варианты для srcset или None, пока воркер их не нарезал."""
+    return variants.responsive_image(post)
+
+
+@register.simple_tag
+def resize_url(image, params):
+    """Подписанный URL картинки в одном из размеров POST_RESIZE_GEOMETRIES."""
+    return resize.resize_url(image.name, params)
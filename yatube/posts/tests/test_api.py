@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Кошки', slug='cats',
+                                         description='')
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Пост {number}')
+            for number in range(3)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, url, **headers):
+        return self.client.get(url, **headers)
+
+    def test_cursor_pages(self):
+        """Лента листается курсорами, новые посты первыми"""
+        url = reverse('posts:api_index')
+        data = self.get(url + '?limit=2').json()
+        self.assertEqual([post['id'] for post in data['results']],
+                         [self.posts[2].pk, self.posts[1].pk])
+        self.assertIsNone(data['previous'])
+        self.assertEqual(data['results'][0]['group'], 'cats')
+        self.assertEqual(data['results'][0]['author'], 'writer')
+        data = self.get(data['next']).json()
+        self.assertEqual([post['id'] for post in data['results']],
+                         [self.posts[0].pk])
+        self.assertIsNone(data['next'])
+
+    def test_not_modified_without_queries(self):
+        """Повторный запрос получает 304 без чтения постов"""
+        url = reverse('posts:api_group', args=['cats'])
+        response = self.get(url)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(1):
+            response = self.get(url, HTTP_IF_MODIFIED_SINCE=response[
+                'Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate(self):
+        """Новый пост и комментарий меняют ETag"""
+        url = reverse('posts:api_profile', args=['writer'])
+        etag = self.get(url)['ETag']
+        Post.objects.create(author=self.author, text='Еще пост')
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 4)
+        url = reverse('posts:api_post_detail', args=[self.posts[0].pk])
+        etag = self.get(url)['ETag']
+        Comment.objects.create(post=self.posts[0], author=self.reader,
+                               text='Мяу')
+        data = self.get(url, HTTP_IF_NONE_MATCH=etag).json()
+        self.assertEqual([comment['text'] for comment in data['comments']],
+                         ['Мяу'])
+        self.assertEqual(data['author_posts_count'], 4)
+
+    def test_follow(self):
+        """Лента подписок только для вошедших и меняется при отписке"""
+        url = reverse('posts:api_follow')
+        self.assertEqual(self.get(url).status_code, 401)
+        self.client.force_login(self.reader)
+        response = self.get(url)
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertEqual(response['Cache-Control'], 'private')
+        Follow.objects.filter(user=self.reader).delete()
+        response = self.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.json()['results'], [])
+
+    def test_compact_json(self):
+        """JSON без пробелов и с кириллицей как есть"""
+        content = self.get(reverse('posts:api_index')).content.decode()
+        self.assertIn('"text":"Пост 2"', content)
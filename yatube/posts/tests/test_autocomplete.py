@@ -0,0 +1,119 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import (Client, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from .. import autocomplete
+from ..models import Group
+
+User = get_user_model()
+
+
+class AutocompleteIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = autocomplete.Autocomplete()
+        for pk, name in enumerate(['anna', 'annabel', 'boris', 'Ёжик']):
+            self.index.add(('user', pk), name, name, [name])
+
+    def labels(self, query):
+        return [item['label'] for item in self.index.suggest(query)]
+
+    def test_prefix_shortest_first(self):
+        """По префиксу сначала идут самые короткие совпадения"""
+        self.assertEqual(self.labels('An'), ['anna', 'annabel'])
+        self.assertEqual(self.labels('еж'), ['Ёжик'])
+
+    def test_fuzzy(self):
+        """Опечатку исправляют триграммы"""
+        self.assertEqual(self.labels('bros'), [])
+        self.assertEqual(self.labels('borsi'), ['boris'])
+
+    def test_remove(self):
+        """Удаленная запись больше не находится"""
+        self.index.remove(('user', 1))
+        self.assertEqual(self.labels('anna'), ['anna'])
+        self.assertEqual(self.index.trie.root.children['a'].children['n']
+                         .children['n'].children['a'].children, {})
+
+    def test_top_refilled_after_remove(self):
+        """Место удаленного слова в узле занимает следующее по длине"""
+        trie = autocomplete.PrefixTrie()
+        names = [f'a{"b" * number}' for number in range(30)]
+        for pk, name in enumerate(names):
+            trie.insert(name, pk)
+        self.assertEqual(trie.search('a', 10), list(range(10)))
+        for pk in range(5):
+            trie.remove(names[pk], pk)
+        self.assertEqual(trie.search('a', 10), list(range(5, 15)))
+        self.assertEqual(trie.search('abbbbbbbbbbbbbbbbbbbbbbbbbb', 10),
+                         [26, 27, 28, 29])
+
+
+@override_settings(AUTOCOMPLETE_CHECK_INTERVAL=0)
+class AutocompleteViewTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(title='Любители кошек',
+                                          slug='cats', description='')
+        User.objects.create_user(username='catherine')
+
+    def suggest(self, query):
+        response = Client().get(reverse('posts:autocomplete'), {'q': query})
+        return [(item['type'], item['label'], item['url'])
+                for item in response.json()['results']]
+
+    def test_groups_and_users(self):
+        """Группы ищутся по названию и slug, пользователи по имени"""
+        self.assertEqual(self.suggest('cat'), [
+            ('group', 'Любители кошек', '/group/cats/'),
+            ('user', 'catherine', '/profile/catherine/'),
+        ])
+        self.assertEqual(self.suggest('люб'),
+                         [('group', 'Любители кошек', '/group/cats/')])
+
+    def test_follows_signals(self):
+        """Индекс обновляется при создании, правке и удалении"""
+        self.suggest('cat')
+        self.group.title = 'Кошатники'
+        self.group.save()
+        User.objects.create_user(username='cathy')
+        self.assertEqual(self.suggest('кош'),
+                         [('group', 'Кошатники', '/group/cats/')])
+        self.assertIn(('user', 'cathy', '/profile/cathy/'),
+                      self.suggest('cath'))
+        self.group.delete()
+        self.assertEqual(self.suggest('кош'), [])
+
+    def test_login_keeps_index(self):
+        """Вход пользователя не сбрасывает индекс"""
+        self.suggest('cat')
+        version = cache.get(autocomplete.VERSION_KEY)
+        Client().force_login(User.objects.get(username='catherine'))
+        self.assertEqual(cache.get(autocomplete.VERSION_KEY), version)
+
+    def test_published_after_commit(self):
+        """Изменение попадает в журнал только после коммита"""
+        self.suggest('cat')
+        version = cache.get(autocomplete.VERSION_KEY)
+        with transaction.atomic():
+            Group.objects.create(title='Собачники', slug='dogs')
+            self.assertEqual(cache.get(autocomplete.VERSION_KEY), version)
+        self.assertEqual(cache.get(autocomplete.VERSION_KEY), version + 1)
+        with transaction.atomic():
+            Group.objects.create(title='Рыбаки', slug='fish')
+            transaction.set_rollback(True)
+        self.assertEqual(cache.get(autocomplete.VERSION_KEY), version + 1)
+        self.assertEqual(self.suggest('соб'),
+                         [('group', 'Собачники', '/group/dogs/')])
+        self.assertEqual(self.suggest('рыб'), [])
+
+    def test_warm_up(self):
+        """Фоновая сборка готовит индекс до первого запроса"""
+        autocomplete._index = None
+        autocomplete.warm_up().join()
+        self.assertIsNotNone(autocomplete._index)
+        with self.assertNumQueries(0):
+            autocomplete.get_index()
+        self.assertEqual(len(self.suggest('cat')), 2)
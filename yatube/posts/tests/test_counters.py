@@ -0,0 +1,110 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from .. import counters
+from ..models import Follow, Group, Post, PostCounter
+
+User = get_user_model()
+
+
+class PostCounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(author=cls.author, group=cls.group, text='Пост')
+
+    def setUp(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        for key, queryset in self.querysets().items():
+            counters.get_count(key, queryset)
+
+    def querysets(self):
+        return {
+            counters.GLOBAL: Post.objects.all(),
+            counters.group_key(self.group.pk): self.group.posts.all(),
+            counters.group_key(self.other_group.pk):
+                self.other_group.posts.all(),
+            counters.author_key(self.author.pk): self.author.posts.all(),
+            counters.follower_key(self.reader.pk): Post.objects.filter(
+                author__following__user=self.reader),
+        }
+
+    def assertCountersExact(self):
+        for key, queryset in self.querysets().items():
+            with self.subTest(key=key):
+                self.assertEqual(PostCounter.objects.get(key=key).value,
+                                 queryset.count())
+
+    def test_create_and_delete(self):
+        """Создание и удаление поста двигают все счетчики"""
+        post = Post.objects.create(author=self.author, group=self.group,
+                                   text='Новый пост')
+        self.assertCountersExact()
+        post.delete()
+        self.assertCountersExact()
+
+    def test_group_change(self):
+        """Смена группы переносит пост между счетчиками групп"""
+        post = Post.objects.create(author=self.author, group=self.group,
+                                   text='Новый пост')
+        post.group = self.other_group
+        post.save()
+        self.assertCountersExact()
+        post.group = None
+        post.save()
+        self.assertCountersExact()
+
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка меняют счетчик ленты подписчика"""
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertCountersExact()
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertCountersExact()
+
+    def test_feed_reads_counter(self):
+        """Пагинатор ленты берет число постов из счетчика"""
+        PostCounter.objects.filter(key=counters.GLOBAL).update(value=25)
+        response = Client().get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 25)
+
+    def test_reconcile_repairs_drift(self):
+        """reconcile_counters возвращает счетчикам точные значения"""
+        PostCounter.objects.update(value=100)
+        PostCounter.objects.filter(
+            key=counters.author_key(self.author.pk)).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertCountersExact()
+
+    @override_settings(POSTS_FANOUT_LIMIT=1)
+    def test_heavy_author_skips_follower_counters(self):
+        """Пост тяжелого автора не трогает счетчики подписчиков"""
+        client = Client()
+        client.force_login(self.reader)
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=self.author)
+        key = counters.follower_key(self.reader.pk)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+        self.assertEqual(PostCounter.objects.get(key=key).value, 0)
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(PostCounter.objects.get(key=key).value, 0)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        PostCounter.objects.filter(key=key).update(value=100)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(PostCounter.objects.get(key=key).value, 0)
@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post
+from .test_thumbnails import png
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(title='Кошки', slug='cats',
+                                         description='')
+        cls.with_image = Post.objects.create(
+            author=cls.author, group=cls.group, text='Кошка, "в кавычках"',
+            image=png('cat.png', (30, 20)))
+        Post.objects.create(author=cls.author, group=cls.group,
+                            text='Та же картинка',
+                            image=png('copy.png', (30, 20)))
+        Post.objects.create(author=cls.author, text='Без группы\nв две строки')
+        Post.objects.create(author=User.objects.create_user(username='other'),
+                            group=cls.group, text='Чужой пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def export(self, url, export_format):
+        response = self.client.get(url, {'format': export_format})
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_profile_csv(self):
+        """CSV автора: заголовок и посты по порядку, переводы строк целы"""
+        content = self.export(
+            reverse('posts:profile_export', args=['writer']), 'csv')
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(rows[0], ['id', 'text', 'pub_date', 'author',
+                                   'group', 'image'])
+        self.assertEqual([row[1] for row in rows[1:]], [
+            'Кошка, "в кавычках"', 'Та же картинка',
+            'Без группы\nв две строки'])
+        self.assertEqual(rows[1][4], 'cats')
+
+    def test_group_jsonl_for_staff(self):
+        """Группу выгружает только модератор"""
+        url = reverse('posts:group_export', args=['cats'])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.author.is_staff = True
+        self.author.save()
+        lines = self.export(url, 'jsonl').decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([record['author'] for record in records],
+                         ['writer', 'writer', 'other'])
+        self.author.is_staff = False
+        self.author.save()
+
+    def test_foreign_profile_forbidden(self):
+        """Чужие посты выгрузить нельзя, неизвестный формат — 404"""
+        url = reverse('posts:profile_export', args=['other'])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        url = reverse('posts:profile_export', args=['writer'])
+        self.assertEqual(
+            self.client.get(url, {'format': 'xml'}).status_code, 404)
+
+    def test_zip_with_images(self):
+        """ZIP содержит посты и каждую картинку один раз"""
+        content = self.export(
+            reverse('posts:profile_export', args=['writer']), 'zip')
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            image = 'images/' + self.with_image.image.name
+            self.assertEqual(archive.namelist(), ['posts.jsonl', image])
+            records = [json.loads(line) for line in
+                       archive.read('posts.jsonl').decode().splitlines()]
+            self.assertEqual(records[0]['image'], image)
+            self.assertEqual(records[2]['image'], '')
+            with self.with_image.image.open() as source:
+                self.assertEqual(archive.read(image), source.read())
+
+    def test_command(self):
+        """Команда пишет ту же выгрузку в файл"""
+        path = os.path.join(TEMP_MEDIA_ROOT, 'cats.jsonl')
+        call_command('export_posts', '--group', 'cats', '--chunk-size', '1',
+                     '--output', path)
+        with open(path, encoding='utf-8') as file:
+            self.assertEqual(len(file.readlines()), 3)
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(title='Кошки', slug='cats',
+                                         description='Про кошек')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Кошка спит на окне')
+        Post.objects.create(author=User.objects.create_user(username='other'),
+                            text='Чужой пост без группы')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds(self):
+        """RSS и Atom сайта, группы и автора содержат свои посты"""
+        feeds = {
+            reverse('posts:rss'): 2,
+            reverse('posts:atom'): 2,
+            reverse('posts:group_rss', args=['cats']): 1,
+            reverse('posts:group_atom', args=['cats']): 1,
+            reverse('posts:profile_rss', args=['other']): 1,
+            reverse('posts:profile_atom', args=['writer']): 1,
+        }
+        for url, count in feeds.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                content = response.content.decode()
+                self.assertIn('xml', response['Content-Type'])
+                self.assertEqual(content.count('<item>')
+                                 + content.count('<entry>'), count)
+        response = self.client.get(reverse('posts:group_rss', args=['cats']))
+        self.assertContains(response, 'Кошка спит на окне')
+        self.assertContains(
+            response, reverse('posts:post_detail', args=[self.post.pk]))
+
+    def test_cached_and_not_modified(self):
+        """Повторный опрос не строит ленту, а без изменений — 304"""
+        url = reverse('posts:profile_rss', args=['writer'])
+        response = self.client.get(url)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).content, response.content)
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_new_post_invalidates(self):
+        """Сохранение поста сразу попадает в ленту"""
+        url = reverse('posts:group_atom', args=['cats'])
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Новый пост про кошек')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый пост про кошек')
+
+    def test_unknown_group(self):
+        """Лента несуществующей группы — 404"""
+        response = self.client.get(reverse('posts:group_rss',
+                                           args=['dogs']))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import counters
+from ..models import (Follow, Group, Post, PostCounter, StoredFile,
+                      TimelineEntry)
+from ..search import SearchResults
+from .test_thumbnails import png
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportPostsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(title='Кошки', slug='cats',
+                                         description='')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(dir=TEMP_MEDIA_ROOT)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        stderr = StringIO()
+        call_command('import_posts', path, '--batch-size', '2',
+                     '--thumbnail-workers', '0', '--images-dir', self.dir,
+                     *args, stdout=StringIO(), stderr=stderr)
+        return stderr.getvalue()
+
+    def test_jsonl(self):
+        """Посты из JSONL попадают в базу, счетчики и поиск"""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        rows = [
+            {'text': 'Кошка спит', 'author': 'writer', 'group': 'cats',
+             'pub_date': '2020-01-02T03:04:05'},
+            {'text': 'Собака лает', 'author': 'writer'},
+            {'text': 'Про погоду', 'author': 'writer'},
+        ]
+        path = self.write('posts.jsonl',
+                          '\n'.join(json.dumps(row) for row in rows))
+        self.run_import(path)
+        self.assertEqual(Post.objects.count(), 3)
+        post = Post.objects.get(text='Кошка спит')
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date.year, 2020)
+        values = dict(PostCounter.objects.values_list('key', 'value'))
+        self.assertEqual(values[counters.author_key(self.author.pk)], 3)
+        self.assertEqual(values[counters.group_key(self.group.pk)], 1)
+        self.assertEqual(TimelineEntry.objects.filter(user=reader).count(),
+                         3)
+        self.assertEqual([found.pk for found in
+                          SearchResults('кошка')[0:10]], [post.pk])
+        self.assertEqual(len(SearchResults('погоду')[0:10]), 1)
+
+    def test_bad_rows_skipped(self):
+        """Ошибочные строки пропускаются, остальные импортируются"""
+        path = self.write('posts.jsonl', '\n'.join([
+            json.dumps({'text': 'Хороший пост', 'author': 'writer'}),
+            '{не json',
+            json.dumps({'text': 'Чужой', 'author': 'nobody'}),
+            json.dumps({'text': 'Без группы', 'author': 'writer',
+                        'group': 'dogs'}),
+            json.dumps({'text': '', 'author': 'writer'}),
+        ]))
+        errors = self.run_import(path)
+        self.assertEqual(list(Post.objects.values_list('text', flat=True)),
+                         ['Хороший пост'])
+        for number in range(2, 6):
+            self.assertIn(f'Строка {number}:', errors)
+
+    def test_rejected_rows_store_no_images(self):
+        """Картинка отклоненной строки не сохраняется в хранилище"""
+        with open(os.path.join(self.dir, 'red.png'), 'wb') as file:
+            file.write(png('red.png', (40, 40)).read())
+        path = self.write('posts.jsonl', json.dumps(
+            {'text': '', 'author': 'writer', 'image': 'red.png'}))
+        storage = Post._meta.get_field('image').storage
+        with mock.patch.object(storage, 'save') as save:
+            errors = self.run_import(path)
+        self.assertIn('Строка 1: пустой текст', errors)
+        save.assert_not_called()
+
+    def test_csv_creates_authors_and_images(self):
+        """CSV с новыми авторами и картинками, одинаковые хранятся раз"""
+        image = png('red.png', (40, 40))
+        with open(os.path.join(self.dir, 'red.png'), 'wb') as file:
+            file.write(image.read())
+        path = self.write('posts.csv', (
+            'text,author,group,pub_date,image\n'
+            'Первый,newbie,cats,,red.png\n'
+            'Второй,newbie,,,red.png\n'
+            'Третий,newbie,,,missing.png\n'
+        ))
+        errors = self.run_import(path, '--create-authors')
+        self.assertIn('Строка 4:', errors)
+        newbie = User.objects.get(username='newbie')
+        self.assertFalse(newbie.has_usable_password())
+        posts = Post.objects.filter(author=newbie)
+        self.assertEqual(posts.count(), 2)
+        names = set(posts.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(name.startswith('posts/'))
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 2)
+        self.assertEqual(posts.first().image_size, posts.first().image.size)
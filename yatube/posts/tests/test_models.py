@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
 from django.test import TestCase
-from ..models import Group, Post
+from ..models import Follow, Group, Post
 
 User = get_user_model()
 
@@ -37,3 +38,13 @@ class GroupModelTest(TestCase):
         group = GroupModelTest.group
         group_object_name = str(group)
         self.assertEqual(group_object_name, group.title)
+
+
+class FollowModelTest(TestCase):
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора запрещена на уровне БД"""
+        user = User.objects.create_user(username='user')
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=user, author=author)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=user, author=author)
@@ -0,0 +1,221 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from .. import pagecache
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Первый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group',
+                             kwargs={'slug': self.group.slug}),
+            'other_group': reverse('posts:group',
+                                   kwargs={'slug': self.other_group.slug}),
+            'profile': reverse('posts:profile',
+                               kwargs={'username': self.author.username}),
+            'post_detail': reverse('posts:post_detail',
+                                   kwargs={'post_id': self.post.pk}),
+        }
+        for url in self.urls.values():
+            self.guest_client.get(url)
+
+    def is_cached(self, name):
+        response = self.guest_client.get(self.urls[name])
+        return response.get('X-Page-Cache') == 'hit'
+
+    def test_pages_served_from_cache(self):
+        """Повторный запрос анонима отдается из кэша"""
+        for name in self.urls:
+            with self.subTest(page=name):
+                self.assertTrue(self.is_cached(name))
+
+    def test_unknown_params_share_page(self):
+        """Посторонние параметры запроса не создают новую копию"""
+        url = self.urls['index']
+        response = self.guest_client.get(url, {'utm_source': 'mail'})
+        self.assertEqual(response.get('X-Page-Cache'), 'hit')
+        response = self.guest_client.get(url, {'page': 2})
+        self.assertIsNone(response.get('X-Page-Cache'))
+
+    def test_authorized_not_cached(self):
+        """Авторизованным страницы из кэша не отдаются"""
+        client = Client()
+        client.force_login(self.author)
+        client.get(self.urls['index'])
+        response = client.get(self.urls['index'])
+        self.assertIsNone(response.get('X-Page-Cache'))
+
+    def test_other_views_skip_lock(self):
+        """Страницы вне списка не проходят через блокировку кэша"""
+        with mock.patch('posts.middleware.get_or_refresh') as refresh:
+            self.guest_client.get(reverse('about:author'))
+            self.guest_client.get(reverse('posts:api_index'))
+            self.guest_client.get('/missing/page/')
+        refresh.assert_not_called()
+
+    def test_new_post_expires_only_affected_pages(self):
+        """Новый пост сбрасывает ленты, но не чужую группу"""
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Второй пост')
+        self.assertFalse(self.is_cached('index'))
+        self.assertFalse(self.is_cached('group'))
+        self.assertFalse(self.is_cached('profile'))
+        self.assertTrue(self.is_cached('other_group'))
+        response = self.guest_client.get(self.urls['profile'])
+        self.assertContains(response, 'Второй пост')
+
+    def test_group_change_expires_both_groups(self):
+        """Перенос поста сбрасывает старую и новую группы"""
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertFalse(self.is_cached('group'))
+        self.assertFalse(self.is_cached('other_group'))
+
+    def test_author_rename_expires_pages(self):
+        """Новое имя автора сразу видно на страницах и в карточках"""
+        author = User.objects.get(pk=self.author.pk)
+        author.last_login = author.date_joined
+        author.save(update_fields=['last_login'])
+        self.assertTrue(self.is_cached('index'))
+        author.username = 'renamed'
+        author.save()
+        for name in ('index', 'group', 'post_detail'):
+            with self.subTest(page=name):
+                self.assertFalse(self.is_cached(name))
+        self.assertContains(self.guest_client.get(self.urls['index']),
+                            'renamed')
+
+    def test_group_rename_expires_pages(self):
+        """Правка группы сбрасывает все страницы с ее постами"""
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        for name in ('index', 'group', 'profile', 'post_detail'):
+            with self.subTest(page=name):
+                self.assertFalse(self.is_cached(name))
+        self.assertTrue(self.is_cached('other_group'))
+
+    def test_comment_expires_post_detail(self):
+        """Комментарий сбрасывает только страницу поста"""
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Комментарий')
+        self.assertFalse(self.is_cached('post_detail'))
+        self.assertTrue(self.is_cached('index'))
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Первый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.post_url = reverse('posts:post_detail',
+                                kwargs={'post_id': self.post.pk})
+
+    def test_not_modified_before_query(self):
+        """Свежая страница отдается 304 без основного запроса"""
+        budgets = {
+            reverse('posts:group', kwargs={'slug': self.group.slug}): 1,
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}): 1,
+            self.post_url: 0,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                response = self.guest_client.get(url)
+                self.assertIn('Last-Modified', response)
+                with self.assertNumQueries(budget):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_first_response_validated(self):
+        """Первый ответ поста, без автора в кэше, несет валидаторы"""
+        response = self.guest_client.get(self.post_url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        cache.delete(pagecache.POST_AUTHOR_KEY.format(self.post.pk))
+        response = self.guest_client.get(
+            self.post_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_comment_changes_etag(self):
+        """Новый комментарий делает сохраненную страницу устаревшей"""
+        self.guest_client.get(self.post_url)
+        etag = self.guest_client.get(self.post_url)['ETag']
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Комментарий')
+        response = self.guest_client.get(self.post_url,
+                                         HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Комментарий')
+
+    def test_post_author_forgotten_on_delete(self):
+        """Автор поста кэшируется не навсегда и забывается при удалении"""
+        with mock.patch.object(pagecache.cache, 'set',
+                               wraps=pagecache.cache.set) as cache_set:
+            self.guest_client.get(self.post_url)
+        cache_set.assert_any_call(
+            pagecache.POST_AUTHOR_KEY.format(self.post.pk), self.author.pk,
+            pagecache.POST_AUTHOR_TIMEOUT)
+        self.assertEqual(pagecache.post_author(self.post.pk), self.author.pk)
+        Post.objects.get(pk=self.post.pk).delete()
+        self.assertIsNone(pagecache.post_author(self.post.pk))
+
+    def test_etag_depends_on_user(self):
+        """Вошедший пользователь не получает 304 на страницу анонима"""
+        url = reverse('posts:profile',
+                      kwargs={'username': self.author.username})
+        etag = self.guest_client.get(url)['ETag']
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(PAGE_CACHE_ENABLED=True)
+    def test_cached_page_not_modified(self):
+        """Страница из кэша тоже отвечает 304"""
+        url = reverse('posts:group', kwargs={'slug': self.group.slug})
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
@@ -1,7 +1,10 @@
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from ..models import Group, Post
+from ..paginators import CursorPage, CursorPaginator
 
 User = get_user_model()
 
@@ -50,3 +53,70 @@ class TaskPagesTests(TestCase):
             with self.subTest(url=url):
                 response = self.guest_client.get(url + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 3)
+
+
+@override_settings(POSTS_CURSOR_PAGINATION=True)
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        Post.objects.bulk_create([Post(author=cls.user,
+                                 text=f'Пост {i}') for i in range(23)])
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def get_page(self, page):
+        response = self.guest_client.get(reverse('posts:index'),
+                                         {'page': page})
+        return response.context['page_obj']
+
+    def test_walk_forward_and_back(self):
+        """Курсоры ведут вперед до конца и обратно к первой странице"""
+        first = self.get_page('')
+        self.assertIsInstance(first, CursorPage)
+        self.assertFalse(first.has_previous())
+        self.assertEqual(list(first), self.ordered[:10])
+        second = self.get_page(first.next_page_number())
+        self.assertEqual(list(second), self.ordered[10:20])
+        third = self.get_page(second.next_page_number())
+        self.assertEqual(list(third), self.ordered[20:])
+        self.assertFalse(third.has_next())
+        back = self.get_page(third.previous_page_number())
+        self.assertEqual(list(back), self.ordered[10:20])
+        self.assertTrue(back.has_previous())
+
+    def test_last_page_and_garbage_cursor(self):
+        """'last' отдает хвост ленты, мусор в ?page= — первую страницу"""
+        last = self.get_page(self.get_page('').paginator.num_pages)
+        self.assertEqual(list(last), self.ordered[13:])
+        self.assertFalse(last.has_next())
+        self.assertEqual(list(self.get_page('n12abc')), self.ordered[:10])
+
+    def test_no_count_query(self):
+        """Глубокая страница — один запрос без OFFSET и COUNT"""
+        token = self.get_page('').next_page_number()
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        with CaptureQueriesContext(connection) as queries:
+            list(paginator.get_page(token))
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql'].upper()
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
+
+    def test_cursor_uses_index_order(self):
+        """Страница по курсору читается из индекса без сортировки"""
+        post = self.ordered[10]
+        group = Group.objects.create(title='Группа', slug='plan')
+        # Те же выборки, что отдают ленты страниц и API.
+        for posts in (Post.objects.for_feed(),
+                      self.user.posts.for_feed(),
+                      group.posts.for_feed()):
+            paginator = CursorPaginator(posts, 10)
+            for queryset in (paginator.after(post.pub_date, post.pk),
+                             paginator.before(post.pub_date, post.pk)):
+                plan = queryset[:11].explain()
+                self.assertIn('USING INDEX', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from .. import timeline
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+POSTS_COUNT = 12
+
+
+class QueryBudgetTests(TestCase):
+    """Число запросов страницы не зависит от числа постов на ней."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.authors = [User.objects.create_user(username=f'author{i}')
+                       for i in range(3)]
+        for i in range(POSTS_COUNT):
+            Post.objects.create(author=cls.authors[i % 3], group=cls.group,
+                                text=f'Пост {i}')
+        cls.post = Post.objects.latest('pk')
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+            Comment.objects.create(post=cls.post, author=author,
+                                   text='Комментарий')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(QueryBudgetTests.reader)
+
+    def assertQueryBudget(self, client, url, budget):
+        # Первый запрос заводит счетчики постов, считаем со второго;
+        # список тяжелых авторов в рабочем режиме тоже лежит в кэше.
+        client.get(url)
+        cache.clear()
+        timeline.heavy_authors()
+        with self.assertNumQueries(budget):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_guest_pages(self):
+        """Ленты и страница поста укладываются в бюджет запросов"""
+        budgets = {
+            reverse('posts:index'): 2,
+            reverse('posts:group', kwargs={'slug': self.group.slug}): 3,
+            reverse('posts:profile',
+                    kwargs={'username': self.authors[0].username}): 3,
+            reverse('posts:post_detail',
+                    kwargs={'post_id': self.post.pk}): 2,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                self.assertQueryBudget(self.guest_client, url, budget)
+
+    def test_follow_index(self):
+        """Лента подписок укладывается в бюджет запросов"""
+        # Сессия, пользователь, счетчик, id страницы из индекса ленты
+        # и сами посты.
+        self.assertQueryBudget(self.authorized_client,
+                               reverse('posts:follow_index'), 5)
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import pagecache
+from ..models import ImageVariant, Post
+from ..thumbnails import ready_thumbnail
+from .test_thumbnails import png
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class RegenerateThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='regenerate')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.posts = [
+            Post.objects.create(author=self.user, text=str(number),
+                                image=png(size=(600 + number, 300)))
+            for number in range(3)
+        ]
+        self.state_file = os.path.join(TEMP_MEDIA_ROOT, 'state')
+
+    def regenerate(self, **options):
+        out = StringIO()
+        call_command('regenerate_thumbnails', workers=0, chunk_size=2,
+                     state_file=self.state_file, stdout=out, **options)
+        return out.getvalue()
+
+    def test_all_images_regenerated(self):
+        """Команда создает миниатюры и варианты всех картинок"""
+        output = self.regenerate()
+        self.assertIn('3/3', output)
+        for post in self.posts:
+            self.assertIsNotNone(ready_thumbnail(post.image, 'card'))
+            self.assertTrue(
+                ImageVariant.objects.filter(source=post.image.name).exists())
+        self.assertFalse(os.path.exists(self.state_file))
+
+    def test_pages_expired_once(self):
+        """Страницы сбрасываются одним bump на весь запуск"""
+        before = {post.pk: post.modified for post in self.posts}
+        with mock.patch('posts.pagecache.bump') as bump:
+            self.regenerate()
+        bump.assert_called_once()
+        self.assertIn(pagecache.author_ns(self.user.pk), bump.call_args.args)
+        for post in Post.objects.all():
+            self.assertGreater(post.modified, before[post.pk])
+
+    def test_resume(self):
+        """С --resume уже обработанные картинки пропускаются"""
+        names = sorted(post.image.name for post in self.posts)
+        with open(self.state_file, 'w') as state:
+            state.write(names[1])
+        self.regenerate(resume=True)
+        self.assertFalse(
+            ImageVariant.objects.filter(source__in=names[:2]).exists())
+        self.assertTrue(
+            ImageVariant.objects.filter(source=names[2]).exists())
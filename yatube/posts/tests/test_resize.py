@@ -0,0 +1,80 @@
+import hashlib
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, override_settings
+from PIL import Image
+
+from .. import resize
+from ..thumbnails import image_storage
+from .test_thumbnails import png
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ResizeTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.name = image_storage().save('posts/image.png', png())
+
+    def test_resized_with_http_caching(self):
+        """Картинка ужимается по подписанному URL и кэшируется клиентом"""
+        url = resize.resize_url(self.name, '320x240')
+        response = Client().get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        content = BytesIO(b''.join(response.streaming_content))
+        self.assertEqual(Image.open(content).size, (320, 160))
+        repeated = Client().get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeated.status_code, 304)
+        self.assertEqual(repeated['ETag'], response['ETag'])
+
+    def test_bad_signature_or_geometry(self):
+        """Чужая подпись и размер вне списка дают 404"""
+        url = resize.resize_url(self.name, '320x240')
+        self.assertEqual(
+            Client().get(url.replace('320x240', '640x480')).status_code, 404)
+        with self.assertRaises(ValueError):
+            resize.resize_url(self.name, '10000x10000')
+
+    def test_single_resize_under_concurrency(self):
+        """Одинаковый вариант при параллельных запросах считается один раз"""
+        calls = []
+        render = resize.render
+
+        def counted(*args):
+            calls.append(1)
+            return render(*args)
+
+        with mock.patch.object(resize, 'render', counted):
+            threads = [threading.Thread(
+                target=resize.resize, args=('200x200-crop', self.name))
+                for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+
+    def test_waiter_keeps_foreign_lock(self):
+        """Не дождавшись владельца, процесс считает сам, но чужую
+        блокировку не снимает"""
+        target = resize.resized_name('320x240', self.name)
+        lock_key = resize.LOCK_KEY.format(
+            'resize:' + hashlib.sha1(target.encode()).hexdigest())
+        cache.set(lock_key, 'owner')
+        with mock.patch.object(resize, 'LOCK_TIMEOUT', 0.1):
+            self.assertEqual(resize.resize('320x240', self.name), target)
+        self.assertEqual(cache.get(lock_key), 'owner')
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..search import SearchResults
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.other = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Кошки', slug='cats',
+                                         description='Про кошек')
+        cls.cats = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Кошка спит. Кошка ест. <script>кошка</script>')
+        cls.dogs = Post.objects.create(author=cls.other,
+                                       text='Собака и одна кошка')
+        Post.objects.create(author=cls.other, text='Про погоду')
+
+    def search(self, query, **filters):
+        results = SearchResults(query, **filters)
+        return [post.pk for post in results[0:10]]
+
+    def test_ranked_results(self):
+        """Находятся все посты со словом, самый релевантный первым"""
+        self.assertEqual(self.search('кошка'), [self.cats.pk, self.dogs.pk])
+
+    def test_prefix_and_facets(self):
+        """Последнее слово ищется по префиксу, фильтры сужают выдачу"""
+        self.assertEqual(self.search('соба'), [self.dogs.pk])
+        self.assertEqual(self.search('кошка', group_id=self.group.pk),
+                         [self.cats.pk])
+        results = SearchResults('кошка')
+        self.assertEqual(dict(results.facet('author_id')),
+                         {self.author.pk: 1, self.other.pk: 1})
+
+    def test_index_follows_changes(self):
+        """Правка и удаление поста сразу видны в поиске"""
+        post = Post.objects.get(pk=self.dogs.pk)
+        post.text = 'Собака и попугай'
+        post.save()
+        self.assertEqual(self.search('кошка'), [self.cats.pk])
+        self.assertEqual(self.search('попугай'), [self.dogs.pk])
+        post.delete()
+        self.assertEqual(self.search('попугай'), [])
+
+    def test_operators_ignored(self):
+        """Синтаксис FTS5 во вводе не ломает запрос"""
+        self.assertEqual(self.search('"кошка" OR NOT*'), [])
+        self.assertEqual(self.search('!!!'), [])
+
+    def test_search_page(self):
+        """Страница поиска подсвечивает совпадения и экранирует текст"""
+        response = Client().get(reverse('posts:search'), {'q': 'кошка'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        self.assertContains(response, '<mark>Кошка</mark>')
+        self.assertContains(response, '&lt;script&gt;')
+        self.assertNotContains(response, '<script>кошка')
+
+    def test_admin_search(self):
+        """Поиск в админке идет по тому же индексу"""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'собака'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.dogs])
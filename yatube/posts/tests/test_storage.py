@@ -0,0 +1,70 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+
+from ..models import Post, StoredFile
+from ..storage import is_content_addressed
+from .test_thumbnails import png
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='storage')
+
+    def test_identical_uploads_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом до последней ссылки"""
+        first = Post.objects.create(author=self.user, text='1',
+                                    image=png('first.png'))
+        second = Post.objects.create(author=self.user, text='2',
+                                     image=png('second.png'))
+        name = first.image.name
+        self.assertTrue(is_content_addressed(name))
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 2)
+        first.delete()
+        self.assertTrue(second.image.storage.exists(name))
+        second.delete()
+        self.assertFalse(second.image.storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_replaced_image_released(self):
+        """Замена картинки снимает ссылку со старого файла"""
+        post = Post.objects.create(author=self.user, text='1',
+                                   image=png('old.png'))
+        old_name = post.image.name
+        post.image = png('new.png', size=(640, 480))
+        post.save()
+        self.assertFalse(post.image.storage.exists(old_name))
+        self.assertEqual(StoredFile.objects.get(name=post.image.name).refs, 1)
+
+    def test_address_media_command(self):
+        """Команда переносит старые файлы и переписывает пути"""
+        legacy = default_storage.save('posts/legacy.png',
+                                      ContentFile(png().read()))
+        for text in ('1', '2'):
+            Post.objects.create(author=self.user, text=text, image=legacy)
+        call_command('address_media', batch_size=1, stdout=StringIO())
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(is_content_addressed(name))
+        self.assertTrue(default_storage.exists(name))
+        self.assertFalse(default_storage.exists(legacy))
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 2)
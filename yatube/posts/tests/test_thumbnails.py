@@ -0,0 +1,131 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from ..models import ImageVariant, Post
+from ..thumbnails import generate, prefetch_thumbnails, ready_thumbnail
+from ..variants import formats, prefetch_variants, widths
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def png(name='image.png', size=(1200, 600)):
+    content = BytesIO()
+    Image.new('RGB', size, (255, 0, 0)).save(content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(author=self.user, text='Пост',
+                                        image=png())
+
+    def test_render_never_resizes(self):
+        """Лента без готовой миниатюры отдает оригинал и ничего не ужимает"""
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+        self.assertIsNone(ready_thumbnail(self.post.image, 'card'))
+
+    def test_generated_thumbnail_used(self):
+        """Без вариантов для srcset карточка показывает миниатюру"""
+        generate(self.post.image.name)
+        ImageVariant.objects.all().delete()
+        thumbnail = ready_thumbnail(self.post.image, 'card')
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, thumbnail.url)
+
+    def test_prefetch_single_lookup(self):
+        """Миниатюры страницы читаются одним запросом к хранилищу sorl"""
+        generate(self.post.image.name)
+        for number in range(3):
+            Post.objects.create(author=self.user, text=f'Пост {number}',
+                                image=png(size=(1201 + number, 600)))
+        posts = list(Post.objects.all())
+        cache.clear()
+        with self.assertNumQueries(1):
+            prefetch_thumbnails(posts, 'card')
+        with self.assertNumQueries(0):
+            prefetch_thumbnails(posts, 'card')
+        found = {post.pk: post.thumbnails['card'] for post in posts}
+        self.assertEqual(found[self.post.pk].url,
+                         ready_thumbnail(self.post.image, 'card').url)
+        self.assertEqual(
+            [pk for pk, thumbnail in found.items() if thumbnail is None],
+            [post.pk for post in posts if post.pk != self.post.pk])
+
+    def test_prefetch_shared_image(self):
+        """Посты с одной и той же картинкой получают общую миниатюру"""
+        generate(self.post.image.name)
+        twin = Post.objects.create(author=self.user, text='Копия',
+                                   image=png('copy.png'))
+        self.assertEqual(twin.image.name, self.post.image.name)
+        posts = [self.post, twin]
+        prefetch_thumbnails(posts, 'card')
+        self.assertIsNotNone(twin.thumbnails['card'])
+        self.assertIsNotNone(self.post.thumbnails['card'])
+
+    def test_variants_generated_once(self):
+        """Картинка режется во все ширины и форматы один раз"""
+        generate(self.post.image.name)
+        generate(self.post.image.name)
+        variants = ImageVariant.objects.filter(source=self.post.image.name)
+        self.assertEqual(variants.count(), len(widths()) * len(formats()))
+        for variant in variants:
+            self.assertEqual(variant.file.width, variant.width)
+            self.assertEqual(variant.file.height, variant.height)
+
+    def test_variants_follow_card_geometry(self):
+        """После смены пропорций карточки варианты режутся заново"""
+        generate(self.post.image.name)
+        geometry = {'card': ('960x480', {'crop': 'center', 'upscale': True})}
+        with override_settings(POST_THUMBNAILS=geometry):
+            generate(self.post.image.name)
+        variants = ImageVariant.objects.filter(source=self.post.image.name)
+        self.assertEqual(variants.count(), len(widths()) * len(formats()))
+        for variant in variants:
+            self.assertEqual(variant.height, variant.width // 2)
+            self.assertEqual(variant.file.height, variant.height)
+
+    def test_card_srcset(self):
+        """Карточка отдает srcset, sizes и ленивую загрузку"""
+        generate(self.post.image.name)
+        response = Client().get(reverse('posts:index'))
+        variant = ImageVariant.objects.filter(
+            source=self.post.image.name, format='jpeg').first()
+        self.assertContains(response, f'{variant.file.url} {variant.width}w')
+        self.assertContains(response, 'sizes="')
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_prefetch_variants_single_query(self):
+        """Варианты страницы читаются одним запросом"""
+        generate(self.post.image.name)
+        Post.objects.create(author=self.user, text='Без вариантов',
+                            image=png('other.png', size=(800, 400)))
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(1):
+            prefetch_variants(posts)
+        ready = [post.responsive_image is not None for post in posts]
+        self.assertEqual(ready.count(True), 1)
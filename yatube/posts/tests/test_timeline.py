@@ -0,0 +1,149 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(TimelineTests.reader)
+
+    def feed(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_post_fans_out(self):
+        """Подписка переносит старые посты, новый пост раскладывается"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_unfollow_trims(self):
+        """Отписка убирает посты автора из ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(POSTS_FANOUT_LIMIT=1)
+    def test_heavy_author_merged_on_read(self):
+        """Посты тяжелого автора не раскладываются, но попадают в ленту"""
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=new_post).exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    @override_settings(POSTS_FANOUT_LIMIT=1)
+    def test_author_becomes_light_again(self):
+        """Автор снова легкий: его посты возвращаются в ленты"""
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        Follow.objects.filter(user=fan).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=new_post).exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    @override_settings(POSTS_FANOUT_LIMIT=2)
+    def test_threshold_crossed_by_bulk_unfollow(self):
+        """Порог пройден сразу на несколько подписчиков"""
+        fans = [User.objects.create_user(username=f'fan{number}')
+                for number in range(3)]
+        for user in fans + [self.reader]:
+            Follow.objects.create(user=user, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+        Follow.objects.filter(user__in=fans).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=new_post).exists())
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    @override_settings(POSTS_FANOUT_LIMIT=1)
+    def test_author_becomes_heavy(self):
+        """Ставший тяжелым автор уходит из лент без дублей в выдаче"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_large_fan_out_and_backfill(self):
+        """Больше 500 подписчиков и постов не упирается в лимит SQLite"""
+        User.objects.bulk_create(
+            [User(username=f'fan{number}') for number in range(600)])
+        fans = User.objects.filter(username__startswith='fan')
+        Follow.objects.bulk_create(
+            [Follow(user=user, author=self.author) for user in fans])
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            TimelineEntry.objects.filter(post=new_post).count(), 600)
+        Post.objects.bulk_create(
+            [Post(author=self.author, text=str(number))
+             for number in range(600)])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 602)
+
+    def walk(self, page=''):
+        """Все страницы ленты подписок по ссылкам «дальше»."""
+        posts = []
+        while page is not None:
+            response = self.authorized_client.get(
+                reverse('posts:follow_index'), {'page': page})
+            page_obj = response.context['page_obj']
+            posts += list(page_obj)
+            page = page_obj.next_page_number() if page_obj.has_next() \
+                else None
+        return posts
+
+    @override_settings(POSTS_FANOUT_LIMIT=1)
+    def test_pages_merge_heavy_authors(self):
+        """Страницы сливают записи ленты и посты тяжелого автора"""
+        light = User.objects.create_user(username='light')
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=light)
+        for number in range(12):
+            Post.objects.create(author=(self.author, light)[number % 2],
+                                text=str(number))
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        self.assertEqual(self.walk(), expected)
+        with self.settings(POSTS_CURSOR_PAGINATION=True):
+            self.assertEqual(self.walk(), expected)
+            last = self.authorized_client.get(
+                reverse('posts:follow_index'), {'page': 'last'})
+            self.assertEqual(list(last.context['page_obj']), expected[-10:])
+
+    def test_entries_read_from_index(self):
+        """Страница записей ленты читается из индекса без сортировки"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        entry = TimelineEntry.objects.get(user=self.reader)
+        self.assertEqual(entry.pub_date, self.old_post.pub_date)
+        feed = timeline.feed(self.reader)
+        for source in (feed, feed.after(entry.pub_date, entry.post_id),
+                       feed.reverse().before(entry.pub_date,
+                                             entry.post_id)):
+            plan = source.queries(11)[0].explain()
+            self.assertIn('timeline_user_date_idx', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
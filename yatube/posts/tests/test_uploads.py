@@ -0,0 +1,175 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, PngImagePlugin
+
+from ..models import Post
+from ..uploads import EXIF_HEADER, ORIENTATION, strip_metadata
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def riff_chunks(data):
+    """Блоки RIFF файла WEBP: [(fourcc, данные)]."""
+    chunks = []
+    position = 12
+    while position < len(data):
+        length = int.from_bytes(data[position + 4:position + 8], 'little')
+        chunks.append((data[position:position + 4],
+                       data[position + 8:position + 8 + length]))
+        position += 8 + length + length % 2
+    return chunks
+
+
+def upload(image_format, name, size=(40, 30), **save_options):
+    content = BytesIO()
+    image = Image.new('RGB', size, (0, 128, 255))
+    image.save(content, image_format, **save_options)
+    return SimpleUploadedFile(name, content.getvalue(), 'image/' + name[-3:])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create(self, image):
+        return self.client.post(reverse('posts:post_create'),
+                                {'text': 'С картинкой', 'image': image})
+
+    def test_exif_stripped_from_jpeg(self):
+        """EXIF вырезается из JPEG, картинка остается целой"""
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        image = upload('JPEG', 'photo.jpg', exif=exif.tobytes())
+        self.create(image)
+        post = Post.objects.get()
+        with Image.open(post.image.path) as saved:
+            self.assertEqual(dict(saved.getexif()), {})
+            self.assertEqual(saved.size, (40, 30))
+            saved.load()
+        self.assertEqual(post.image_size, post.image.size)
+
+    def test_orientation_kept(self):
+        """Из EXIF остается только ориентация снимка"""
+        files = (('JPEG', 'photo.jpg'), ('PNG', 'image.png'))
+        for image_format, name in files:
+            with self.subTest(image_format=image_format):
+                exif = Image.Exif()
+                exif[0x010F] = 'Камера'
+                exif[0x0112] = 6
+                self.create(upload(image_format, name, exif=exif.tobytes()))
+                post = Post.objects.latest('pk')
+                with Image.open(post.image.path) as saved:
+                    saved.load()
+                    self.assertEqual(dict(saved.getexif()), {0x0112: 6})
+
+    def test_text_chunks_stripped_from_png(self):
+        """Текстовые блоки PNG вырезаются"""
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Author', 'secret')
+        self.create(upload('PNG', 'image.png', pnginfo=info))
+        with Image.open(Post.objects.get().image.path) as saved:
+            self.assertNotIn('Author', saved.info)
+            saved.load()
+
+    def test_metadata_stripped_from_webp(self):
+        """Из WEBP уходят XMP и EXIF, кроме ориентации; флаги и размер
+        RIFF исправлены"""
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        exif[ORIENTATION] = 6
+        # VP8X: флаги EXIF и XMP, холст 40x30; пиксели здесь не важны.
+        vp8x = bytes([0x0C, 0, 0, 0]) + (39).to_bytes(3, 'little') + (
+            29).to_bytes(3, 'little')
+        body = b''.join(
+            fourcc + len(data).to_bytes(4, 'little') + data
+            + b'\x00' * (len(data) % 2)
+            for fourcc, data in ((b'VP8X', vp8x), (b'VP8L', b'pixels!'),
+                                 (b'EXIF', exif.tobytes()),
+                                 (b'XMP ', b'<x:xmpmeta/>')))
+        data = b'RIFF' + (len(body) + 4).to_bytes(4, 'little') + b'WEBP'
+        source = File(BytesIO(data + body), name='image.webp')
+        with strip_metadata(source, 'WEBP') as stripped:
+            result = stripped.read()
+        self.assertEqual(int.from_bytes(result[4:8], 'little'),
+                         len(result) - 8)
+        chunks = riff_chunks(result)
+        self.assertEqual([fourcc for fourcc, _ in chunks],
+                         [b'VP8X', b'VP8L', b'EXIF'])
+        self.assertEqual(chunks[0][1][0], 0x08)
+        self.assertEqual(chunks[1][1], b'pixels!')
+        kept = Image.Exif()
+        kept.load(EXIF_HEADER + chunks[2][1])
+        self.assertEqual(dict(kept), {ORIENTATION: 6})
+
+    def test_quota_counts_stripped_size(self):
+        """Квота проверяется по размеру без метаданных"""
+        exif = Image.Exif()
+        exif[0x010F] = 'x' * 5000
+        image = upload('JPEG', 'photo.jpg', exif=exif.tobytes())
+        with override_settings(POST_IMAGE_QUOTA=2000):
+            self.create(image)
+        post = Post.objects.get()
+        self.assertLess(post.image_size, 2000)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_decompression_bomb_rejected(self):
+        """Картинка с огромным разрешением отклоняется по заголовку"""
+        response = self.create(upload('PNG', 'bomb.png'))
+        self.assertFormError(response, 'form', 'image',
+                             'Слишком большое разрешение картинки.')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_SIZE=100)
+    def test_large_file_rejected(self):
+        """Файл больше лимита не сохраняется"""
+        response = self.create(upload('PNG', 'large.png', size=(300, 300)))
+        self.assertIn('Файл больше',
+                      response.context['form'].errors['image'][0])
+        self.assertFalse(Post.objects.exists())
+
+    def test_unsupported_format_rejected(self):
+        """Форматы вне списка разрешенных не принимаются"""
+        response = self.create(upload('BMP', 'image.bmp'))
+        self.assertFormError(response, 'form', 'image',
+                             'Формат BMP не поддерживается.')
+
+    @override_settings(CSRF_FAILURE_VIEW='django.views.csrf.csrf_failure')
+    def test_csrf_still_checked(self):
+        """Свой обработчик загрузок не отключает проверку CSRF"""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(reverse('posts:post_create'),
+                               {'text': 'Без токена'})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Post.objects.exists())
+
+    def test_quota(self):
+        """Автор не может превысить квоту на картинки"""
+        Post.objects.create(author=self.user, text='Старый', image_size=990)
+        with override_settings(POST_IMAGE_QUOTA=1000):
+            response = self.create(upload('PNG', 'image.png'))
+        self.assertIn('Превышена квота',
+                      response.context['form'].errors['image'][0])
+        self.assertEqual(Post.objects.count(), 1)
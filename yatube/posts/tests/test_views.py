@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
+from ..cards import card_key
 from ..models import Group, Post, Follow
 from django import forms
 from django.core.cache import cache
@@ -141,18 +142,18 @@ class ViewsTest(TestCase):
         self.assertEqual(comment_from_response, text)
 
     def test_cache(self):
-        """Берем респонз с главной страницы, запиливаем новый пост,
-        обновляем респонз с главной страницы, смотрим, появился ли он там,
-        если нет - ок. Дальше чистим кэш и снова далем запрос - пост появился-
-        кэш работает.
+        """Карточка поста кэшируется по времени изменения: правка и новый
+        пост сразу видны на главной, кэш чистить не нужно.
         """
-        response_old = self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('posts:index'))
+        post = Post.objects.get(pk=ViewsTest.post.pk)
+        self.assertIsNotNone(cache.get(card_key(post)))
         Post.objects.create(text='test2', author=ViewsTest.authoruser)
-        response_new = self.guest_client.get(reverse('posts:index'))
-        self.assertEqual(response_old.content, response_new.content)
-        cache.clear()
-        response_cash_clr = self.guest_client.get(reverse('posts:index'))
-        self.assertNotEqual(response_new.content, response_cash_clr.content)
+        post.text = 'Исправленный текст'
+        post.save()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'test2')
+        self.assertContains(response, 'Исправленный текст')
 
     def test_follow(self):
         """Юзер фолловит юзера - появляется новый фоллоу объект,
@@ -0,0 +1,195 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import default, delete, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+logger = logging.getLogger(__name__)
+
+EMPTY = cached_db_kvstore.EMPTY_VALUE
+
+_executor = None
+
+
+def specs():
+    return settings.POST_THUMBNAILS
+
+
+def thumbnail_options(source, options):
+    """Опции так же, как их дополняет sorl перед выбором имени файла."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def image_storage():
+    from .models import Post
+    return Post._meta.get_field('image').storage
+
+
+def thumbnail_file(file_, spec):
+    """Файл миниатюры, каким его назовет sorl; сам файл не создается."""
+    geometry, options = specs()[spec]
+    source = ImageFile(file_)
+    name = default.backend._get_thumbnail_filename(
+        source, geometry, thumbnail_options(source, options))
+    return ImageFile(name, default.storage)
+
+
+def ready_thumbnail(file_, spec):
+    """Готовая миниатюра из хранилища ключей sorl или None."""
+    if not file_:
+        return None
+    return default.kvstore.get(thumbnail_file(file_, spec))
+
+
+def _kvstore_get_many(image_files):
+    """Пакетный KVStore.get: один get_many в кэш и один запрос в БД."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return {key: kvstore.get(image_file)
+                for key, image_file in image_files.items()}
+    raw_keys = {key: add_prefix(image_file.key)
+                for key, image_file in image_files.items()}
+    values = kvstore.cache.get_many(set(raw_keys.values()))
+    missing = {raw_key for raw_key in raw_keys.values()
+               if raw_key not in values}
+    if missing:
+        stored = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        fetched = {raw_key: stored.get(raw_key, EMPTY)
+                   for raw_key in missing}
+        kvstore.cache.set_many(fetched,
+                               sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    return {
+        key: deserialize_image_file(values[raw_key])
+        for key, raw_key in raw_keys.items()
+        if values[raw_key] and values[raw_key] != EMPTY
+    }
+
+
+def prefetch_thumbnails(posts, spec):
+    """Кладет готовые миниатюры в post.thumbnails[spec] для всей страницы."""
+    files = {post.pk: thumbnail_file(post.image, spec)
+             for post in posts if post.image}
+    found = _kvstore_get_many(files)
+    for post in posts:
+        post.__dict__.setdefault('thumbnails', {})[spec] = found.get(post.pk)
+
+
+def post_thumbnail(post, spec):
+    prefetched = post.__dict__.get('thumbnails', {})
+    if spec in prefetched:
+        return prefetched[spec]
+    return ready_thumbnail(post.image, spec)
+
+
+def generate(name, notify=True):
+    """Создает все миниатюры картинки; выполняется в процессе-воркере.
+
+    Без notify страницы с постами не сбрасываются: это делает вызывающий
+    код один раз на много картинок.
+    """
+    from .variants import create_variants
+    source = ImageFile(name, image_storage())
+    for geometry, options in specs().values():
+        get_thumbnail(source, geometry, **options)
+    create_variants(name)
+    if notify:
+        media_ready(name)
+
+
+def regenerate(name, force=False):
+    """generate() для массовой перегенерации; возвращает прочитанные байты.
+
+    С force старые миниатюры и варианты удаляются и создаются заново.
+    Кэши не сбрасываются, см. touch_posts().
+    """
+    from .models import ImageVariant
+    if force:
+        delete(ImageFile(name, image_storage()), delete_file=False)
+        for variant in ImageVariant.objects.filter(source=name):
+            variant.file.delete(save=False)
+            variant.delete()
+    generate(name, notify=False)
+    return image_storage().size(name)
+
+
+def touch_posts(names):
+    """Обновляет modified постов с картинками names и возвращает
+    пространства имен их страниц для pagecache.bump().
+    """
+    from . import pagecache
+    from .models import Post
+    posts = Post.objects.filter(image__in=names)
+    posts.update(modified=timezone.now())
+    namespaces = {pagecache.GLOBAL}
+    for post in posts.only('pk', 'author_id', 'group_id').iterator():
+        namespaces.update((pagecache.post_ns(post.pk),
+                           pagecache.author_ns(post.author_id)))
+        if post.group_id is not None:
+            namespaces.add(pagecache.group_ns(post.group_id))
+    return namespaces
+
+
+def media_ready(name):
+    # Карточки и страницы с заглушкой вместо миниатюры должны обновиться.
+    from . import pagecache
+    pagecache.bump(*touch_posts([name]))
+
+
+def make_executor(workers):
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    )
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = make_executor(getattr(settings, 'THUMBNAIL_WORKERS', 2))
+    return _executor
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Thumbnail generation failed: %s', error)
+
+
+def submit(name):
+    future = executor().submit(generate, name)
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def queue(post):
+    """Ставит в очередь миниатюры картинки поста после коммита."""
+    if not post.image:
+        return
+    name = post.image.name
+    if getattr(settings, 'THUMBNAIL_PREGENERATE', 'async') == 'sync':
+        transaction.on_commit(lambda: generate(name))
+    else:
+        transaction.on_commit(lambda: submit(name))
@@ -0,0 +1,221 @@
+import copy
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from . import counters
+from .models import Follow, Post, TimelineEntry
+
+HEAVY_AUTHORS_KEY = 'posts:heavy_authors'
+HEAVY_AUTHORS_TIMEOUT = 300
+
+
+def fanout_limit():
+    return getattr(settings, 'POSTS_FANOUT_LIMIT', 1000)
+
+
+def followers_count(author_id):
+    return Follow.objects.filter(author_id=author_id).count()
+
+
+def is_heavy(author_id):
+    return followers_count(author_id) > fanout_limit()
+
+
+def heavy_authors():
+    """Авторы, чьи посты не раскладываются по лентам, а домешиваются."""
+    author_ids = cache.get(HEAVY_AUTHORS_KEY)
+    if author_ids is None:
+        author_ids = set(Follow.objects.values('author').annotate(
+            followers=Count('pk')
+        ).filter(
+            followers__gt=fanout_limit()
+        ).order_by().values_list('author', flat=True))
+        cache.set(HEAVY_AUTHORS_KEY, author_ids, HEAVY_AUTHORS_TIMEOUT)
+    return author_ids
+
+
+def forget_heavy_authors():
+    cache.delete(HEAVY_AUTHORS_KEY)
+
+
+def sync_heavy(author_id):
+    """Тяжелый ли автор после смены подписчиков; сбрасывает устаревший
+    кэш heavy_authors().
+
+    Сравнивается состояние, а не точное число подписчиков: при
+    массовом удалении или одновременных подписках число может
+    перескочить порог.
+    """
+    heavy = is_heavy(author_id)
+    cached = cache.get(HEAVY_AUTHORS_KEY)
+    if cached is not None and heavy != (author_id in cached):
+        forget_heavy_authors()
+    return heavy
+
+
+def _latest_post_id(author_id):
+    return Post.objects.filter(author_id=author_id).order_by(
+        '-pk').values_list('pk', flat=True).first()
+
+
+def has_gaps(author_id):
+    """Последнего поста автора нет в чьей-то ленте: пока автор был
+    тяжелым, его посты не раскладывались."""
+    latest = _latest_post_id(author_id)
+    if latest is None:
+        return False
+    return (TimelineEntry.objects.filter(post_id=latest).count()
+            < followers_count(author_id))
+
+
+def has_entries(author_id):
+    """Посты автора еще лежат в лентах: он только что стал тяжелым."""
+    latest = _latest_post_id(author_id)
+    return (latest is not None
+            and TimelineEntry.objects.filter(post_id=latest).exists())
+
+
+def _insert(entries):
+    # Размер пачки выбирает бэкенд: у SQLite не больше 500 строк в одном
+    # INSERT ... SELECT ... UNION ALL.
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Кладет новый пост в ленты всех подписчиков автора."""
+    if is_heavy(post.author_id):
+        return
+    user_ids = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    _insert(TimelineEntry(user_id=user_id, post_id=post.pk,
+                          pub_date=post.pub_date)
+            for user_id in user_ids.iterator())
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту пользователя все посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('pk', 'pub_date')
+    _insert(TimelineEntry(user_id=user_id, post_id=post_id,
+                          pub_date=pub_date)
+            for post_id, pub_date in posts.iterator())
+
+
+def trim(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 post__author_id=author_id).delete()
+
+
+def trim_followers(author_id):
+    """Автор стал тяжелым: его посты домешиваются при чтении, а копии
+    в лентах дали бы дубли."""
+    TimelineEntry.objects.filter(post__author_id=author_id).delete()
+
+
+def backfill_followers(author_id):
+    """Автор перестал быть тяжелым: его посты снова живут в лентах."""
+    user_ids = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    for user_id in user_ids.iterator():
+        backfill(user_id, author_id)
+
+
+class Feed:
+    """Лента подписок для Paginator и CursorPaginator.
+
+    Источники упорядочены по (-pub_date, -id) и читаются из индексов:
+    записи ленты — из timeline_user_date_idx, посты каждого тяжелого
+    автора — из post_author_date_idx. Из каждого берется не больше
+    нужного числа пар (pub_date, id), пары сливаются, и целиком
+    загружаются только посты страницы.
+    """
+
+    def __init__(self, user_id, heavy_ids):
+        self.user_id = user_id
+        self.heavy_ids = heavy_ids
+        self.related = False
+        self.descending = True
+        self.older_than = None
+        self.newer_than = None
+
+    def _clone(self, **changes):
+        clone = copy.copy(self)
+        clone.__dict__.update(changes)
+        return clone
+
+    def for_feed(self):
+        return self._clone(related=True)
+
+    def order_by(self, *fields):
+        # Порядок ленты всегда (-pub_date, -id), как у CursorPaginator.
+        return self
+
+    def reverse(self):
+        return self._clone(descending=not self.descending)
+
+    def after(self, pub_date, pk):
+        return self._clone(older_than=(pub_date, pk))
+
+    def before(self, pub_date, pk):
+        return self._clone(newer_than=(pub_date, pk))
+
+    def count(self):
+        """Число постов по счетчикам: в счетчике подписчика только
+        легкие авторы, тяжелые добавляются своими счетчиками."""
+        total = counters.get_count(
+            counters.follower_key(self.user_id),
+            TimelineEntry.objects.filter(user_id=self.user_id))
+        for author_id in self.heavy_ids:
+            total += counters.get_count(
+                counters.author_key(author_id),
+                Post.objects.filter(author_id=author_id))
+        return total
+
+    def queries(self, limit=None):
+        """Запросы пар (pub_date, id) к каждому источнику."""
+        sources = [(TimelineEntry.objects.filter(user_id=self.user_id),
+                    'post_id')]
+        sources += [(Post.objects.filter(author_id=author_id), 'pk')
+                    for author_id in self.heavy_ids]
+        return [self._window(queryset, key)[:limit]
+                for queryset, key in sources]
+
+    def _window(self, queryset, key):
+        if self.older_than is not None:
+            pub_date, pk = self.older_than
+            queryset = queryset.filter(pub_date__lte=pub_date).exclude(
+                pub_date=pub_date, **{f'{key}__gte': pk})
+        if self.newer_than is not None:
+            pub_date, pk = self.newer_than
+            queryset = queryset.filter(pub_date__gte=pub_date).exclude(
+                pub_date=pub_date, **{f'{key}__lte': pk})
+        ordering = ('-pub_date', f'-{key}')
+        if not self.descending:
+            ordering = ('pub_date', key)
+        return queryset.order_by(*ordering).values_list('pub_date', key)
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice) or item.step is not None:
+            raise TypeError('Лента поддерживает только срезы')
+        merged = heapq.merge(*self.queries(item.stop),
+                             reverse=self.descending)
+        post_ids = [pk for _, pk in islice(merged, item.start, item.stop)]
+        posts = Post.objects.for_feed() if self.related else Post.objects
+        posts = posts.in_bulk(post_ids)
+        # Пост могли удалить между чтением индекса и загрузкой.
+        return [posts[pk] for pk in post_ids if pk in posts]
+
+
+def feed(user):
+    """Лента подписок: материализованные записи плюс тяжелые авторы."""
+    followed_heavy = []
+    heavy = heavy_authors()
+    if heavy:
+        followed_heavy = sorted(Follow.objects.filter(
+            user=user, author_id__in=heavy
+        ).values_list('author_id', flat=True))
+    return Feed(user.pk, followed_heavy)
@@ -0,0 +1,289 @@
+import shutil
+import tempfile
+import warnings
+import zlib
+from functools import wraps
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db.models import Sum
+from django.template.defaultfilters import filesizeformat
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image
+
+# Заголовок JPEG с большим блоком EXIF может занимать больше одного куска.
+HEAD_LIMIT = 1024 * 1024
+COPY_CHUNK = 64 * 1024
+
+JPEG_SOS = 0xDA
+JPEG_APP1 = 0xE1
+EXIF_HEADER = b'Exif\x00\x00'
+ORIENTATION = 0x0112
+# APP1 (EXIF, XMP), APP13 (IPTC) и комментарии. APP2 (ICC) и APP14
+# (Adobe) остаются: без них искажаются цвета.
+JPEG_DROPPED = {0xE1, 0xED, 0xFE}
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_DROPPED = {b'eXIf', b'tEXt', b'zTXt', b'iTXt', b'tIME'}
+WEBP_SIGNATURE = b'WEBP'
+# Флаги в первом байте VP8X: есть блок EXIF, есть блок XMP.
+VP8X_EXIF = 0x08
+VP8X_XMP = 0x04
+
+
+def max_size():
+    return getattr(settings, 'POST_IMAGE_MAX_SIZE', 20 * 1024 * 1024)
+
+
+def max_pixels():
+    return getattr(settings, 'POST_IMAGE_MAX_PIXELS', 40_000_000)
+
+
+def allowed_formats():
+    return getattr(settings, 'POST_IMAGE_FORMATS_ALLOWED',
+                   ('JPEG', 'PNG', 'GIF', 'WEBP'))
+
+
+def probe(fileobj):
+    """Формат и размер из заголовка; пиксели не декодируются."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        try:
+            image = Image.open(fileobj)
+        except Image.DecompressionBombError:
+            raise ValidationError('Слишком большое разрешение картинки.',
+                                  code='too_many_pixels')
+        except Exception:
+            raise ValidationError('Загрузите правильное изображение.',
+                                  code='invalid_image')
+    return image.format, image.size
+
+
+def check_image(image_format, size):
+    if image_format not in allowed_formats():
+        raise ValidationError(f'Формат {image_format} не поддерживается.')
+    width, height = size
+    if width * height > max_pixels():
+        raise ValidationError('Слишком большое разрешение картинки.',
+                              code='too_many_pixels')
+
+
+def check_quota(user, size, exclude=None):
+    """Не дает автору хранить картинок больше POST_IMAGE_QUOTA байт."""
+    from .models import Post
+    quota = getattr(settings, 'POST_IMAGE_QUOTA', None)
+    if quota is None or user is None:
+        return
+    used = Post.objects.filter(author=user).exclude(pk=exclude).aggregate(
+        total=Sum('image_size'))['total'] or 0
+    if used + size > quota:
+        raise ValidationError(
+            f'Превышена квота на картинки: {filesizeformat(quota)}.')
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку сразу на диск и проверяет ее по заголовку.
+
+    Как только заголовок прочитан, картинка неподходящего формата или
+    разрешения и файл больше POST_IMAGE_MAX_SIZE отклоняются: остаток
+    потока пропускается, а причина сохраняется в file.upload_error.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.head = b''
+        self.probed = False
+        self.error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        self.received += len(raw_data)
+        if self.received > max_size():
+            self.error = f'Файл больше {filesizeformat(max_size())}.'
+            return None
+        if not self.probed:
+            self.sniff(raw_data)
+            if self.error:
+                return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def sniff(self, raw_data):
+        self.head += raw_data
+        try:
+            check_image(*probe(BytesIO(self.head)))
+        except ValidationError as error:
+            # Неполный заголовок не распознается — ждем следующий кусок.
+            if error.code != 'invalid_image' or len(self.head) >= HEAD_LIMIT:
+                self.error = error.message
+            return
+        self.probed = True
+        self.head = b''
+
+    def file_complete(self, file_size):
+        file_ = super().file_complete(file_size)
+        file_.upload_error = self.error
+        return file_
+
+
+def image_uploads(view):
+    """Принимает файлы представления через ImageUploadHandler.
+
+    Обработчик ставится только здесь, а не в FILE_UPLOAD_HANDLERS: иначе
+    он отклонял бы любые файлы сайта, например в админке. Сменить его
+    можно до первого чтения request.POST, а CsrfViewMiddleware читает
+    POST раньше представления, поэтому CSRF проверяется уже внутри.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+    return wrapper
+
+
+def _copy(src, dst, length):
+    while length > 0:
+        chunk = src.read(min(length, COPY_CHUNK))
+        if not chunk:
+            break
+        dst.write(chunk)
+        length -= len(chunk)
+
+
+def _orientation(data):
+    """EXIF с одним тегом ориентации или b'', если поворот не нужен."""
+    exif = Image.Exif()
+    try:
+        exif.load(data)
+    except Exception:
+        return b''
+    orientation = exif.get(ORIENTATION)
+    if orientation in (None, 1):
+        return b''
+    kept = Image.Exif()
+    kept[ORIENTATION] = orientation
+    return kept.tobytes()[len(EXIF_HEADER):]
+
+
+def _strip_jpeg(src, dst):
+    dst.write(src.read(2))
+    while True:
+        marker = src.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            dst.write(marker)
+            break
+        if marker[1] == JPEG_SOS:
+            dst.write(marker)
+            break
+        length_bytes = src.read(2)
+        length = int.from_bytes(length_bytes, 'big') - 2
+        if marker[1] == JPEG_APP1:
+            data = src.read(length)
+            kept = data.startswith(EXIF_HEADER) and _orientation(data)
+            if kept:
+                kept = EXIF_HEADER + kept
+                dst.write(marker + (len(kept) + 2).to_bytes(2, 'big') + kept)
+            continue
+        if marker[1] in JPEG_DROPPED:
+            src.seek(length, 1)
+            continue
+        dst.write(marker + length_bytes)
+        _copy(src, dst, length)
+    shutil.copyfileobj(src, dst, COPY_CHUNK)
+
+
+def _strip_png(src, dst):
+    dst.write(src.read(len(PNG_SIGNATURE)))
+    while True:
+        header = src.read(8)
+        if len(header) < 8:
+            dst.write(header)
+            break
+        length = int.from_bytes(header[:4], 'big')
+        if header[4:] == b'eXIf':
+            kept = _orientation(src.read(length))
+            src.seek(4, 1)
+            if kept:
+                dst.write(len(kept).to_bytes(4, 'big') + b'eXIf' + kept
+                          + zlib.crc32(b'eXIf' + kept).to_bytes(4, 'big'))
+            continue
+        if header[4:] in PNG_DROPPED:
+            src.seek(length + 4, 1)
+            continue
+        dst.write(header)
+        _copy(src, dst, length + 4)
+    shutil.copyfileobj(src, dst, COPY_CHUNK)
+
+
+def _riff_chunk(fourcc, data):
+    return (fourcc + len(data).to_bytes(4, 'little') + data
+            + b'\x00' * (len(data) % 2))
+
+
+def _strip_webp(src, dst):
+    dst.write(src.read(12))
+    flags_at = None
+    exif_kept = False
+    while True:
+        header = src.read(8)
+        if len(header) < 8:
+            dst.write(header)
+            break
+        fourcc = header[:4]
+        length = int.from_bytes(header[4:], 'little')
+        padded = length + length % 2
+        if fourcc == b'EXIF':
+            kept = _orientation(src.read(length))
+            src.seek(padded - length, 1)
+            if kept:
+                dst.write(_riff_chunk(b'EXIF', kept))
+                exif_kept = True
+            continue
+        if fourcc == b'XMP ':
+            src.seek(padded, 1)
+            continue
+        if fourcc == b'VP8X':
+            flags_at = dst.tell() + 8
+        dst.write(header)
+        _copy(src, dst, padded)
+    # Размер RIFF и флаги VP8X известны, только когда файл дописан.
+    end = dst.tell()
+    dst.seek(4)
+    dst.write((end - 8).to_bytes(4, 'little'))
+    if flags_at is not None:
+        dst.seek(flags_at)
+        flags = dst.read(1)[0] & ~VP8X_XMP
+        if not exif_kept:
+            flags &= ~VP8X_EXIF
+        dst.seek(flags_at)
+        dst.write(bytes([flags]))
+    dst.seek(end)
+
+
+def strip_metadata(upload, image_format):
+    """Копия загрузки без EXIF, XMP и текстовых блоков, кусками.
+
+    Пиксели не перекодируются, поэтому из EXIF остается тег
+    ориентации: без него снимок с телефона показался бы повернутым.
+    """
+    stripped = File(tempfile.TemporaryFile(), name=upload.name)
+    upload.seek(0)
+    if image_format == 'JPEG':
+        _strip_jpeg(upload, stripped)
+    elif image_format == 'PNG' and upload.read(8) == PNG_SIGNATURE:
+        upload.seek(0)
+        _strip_png(upload, stripped)
+    elif image_format == 'WEBP' and upload.read(12)[8:] == WEBP_SIGNATURE:
+        upload.seek(0)
+        _strip_webp(upload, stripped)
+    else:
+        upload.seek(0)
+        shutil.copyfileobj(upload, stripped, COPY_CHUNK)
+    stripped.seek(0)
+    return stripped
@@ -1,17 +1,40 @@
 from django.urls import path
-from . import views
+from . import api, feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('rss/', feeds.LatestPostsFeed(), name='rss'),
+    path('atom/', feeds.LatestPostsAtomFeed(), name='atom'),
     path('group/<slug:slug>/', views.group_list, name='group'),
+    path('group/<slug:slug>/rss/', feeds.GroupPostsFeed(),
+         name='group_rss'),
+    path('group/<slug:slug>/atom/', feeds.GroupPostsAtomFeed(),
+         name='group_atom'),
+    path('group/<slug:slug>/export/', views.group_export,
+         name='group_export'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('profile/<str:username>/rss/', feeds.AuthorPostsFeed(),
+         name='profile_rss'),
+    path('profile/<str:username>/atom/', feeds.AuthorPostsAtomFeed(),
+         name='profile_atom'),
+    path('profile/<str:username>/export/', views.profile_export,
+         name='profile_export'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment', views.add_comment, name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
+    path('autocomplete/', views.suggest, name='autocomplete'),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/posts/<int:post_id>/', api.post_detail, name='api_post_detail'),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group'),
+    path('api/profile/<str:username>/', api.profile, name='api_profile'),
+    path('api/follow/', api.follow, name='api_follow'),
+    path('media/resize/<str:signed>/<path:name>', views.resize_image,
+         name='resize_image'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -0,0 +1,111 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .models import ImageVariant
+from .thumbnails import image_storage
+
+MIME_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+def widths():
+    return getattr(settings, 'POST_IMAGE_WIDTHS', (320, 480, 640, 960))
+
+
+def formats():
+    """Форматы из настроек, которые умеет сохранять собранный Pillow."""
+    Image.init()
+    return [fmt for fmt in getattr(settings, 'POST_IMAGE_FORMATS',
+                                   ('webp', 'jpeg'))
+            if fmt.upper() in Image.SAVE]
+
+
+def aspect_ratio():
+    geometry, _ = settings.POST_THUMBNAILS['card']
+    width, height = geometry.split('x')
+    return int(height) / int(width)
+
+
+def create_variants(name):
+    """Режет картинку под карточку во всех ширинах и форматах.
+
+    Варианты сравниваются по ширине, высоте и формату: уже созданные не
+    пересоздаются, а оставшиеся от прежних пропорций карточки
+    удаляются, так что повторный вызов для той же картинки ничего не
+    делает.
+    """
+    wanted = {(width, round(width * aspect_ratio()), fmt)
+              for width in widths() for fmt in formats()}
+    done = set()
+    for variant in ImageVariant.objects.filter(source=name):
+        key = (variant.width, variant.height, variant.format)
+        if key in wanted:
+            done.add(key)
+        else:
+            variant.file.delete(save=False)
+            variant.delete()
+    todo = sorted(wanted - done)
+    if not todo:
+        return
+    with image_storage().open(name) as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    stem = os.path.splitext(os.path.basename(name))[0]
+    quality = getattr(settings, 'POST_IMAGE_QUALITY', 80)
+    for width, height, fmt in todo:
+        content = BytesIO()
+        ImageOps.fit(image, (width, height), Image.LANCZOS).save(
+            content, fmt.upper(), quality=quality)
+        variant = ImageVariant(source=name, width=width, height=height,
+                               format=fmt)
+        # Размер в имени: после смены пропорций у варианта новый URL.
+        variant.file.save(f'{stem}_{width}x{height}.{fmt}',
+                          ContentFile(content.getvalue()), save=False)
+        variant.save()
+
+
+class ResponsiveImage:
+    """Готовые варианты картинки в виде атрибутов для <picture>."""
+
+    def __init__(self, variants):
+        by_format = {}
+        for variant in sorted(variants, key=lambda v: v.width):
+            by_format.setdefault(variant.format, []).append(variant)
+        fallback = by_format.pop('jpeg', None) or by_format.popitem()[1]
+        largest = fallback[-1]
+        self.src = largest.file.url
+        self.width = largest.width
+        self.height = largest.height
+        self.srcset = self.join(fallback)
+        self.sources = [(MIME_TYPES.get(fmt, f'image/{fmt}'), self.join(items))
+                        for fmt, items in by_format.items()]
+        self.sizes = getattr(settings, 'POST_IMAGE_SIZES',
+                             '(max-width: 960px) 100vw, 960px')
+
+    @staticmethod
+    def join(variants):
+        return ', '.join(f'{v.file.url} {v.width}w' for v in variants)
+
+
+def prefetch_variants(posts):
+    """Кладет в post.responsive_image варианты всей страницы одним
+    запросом; None, если варианты еще не готовы.
+    """
+    names = {post.image.name for post in posts if post.image}
+    found = {}
+    if names:
+        for variant in ImageVariant.objects.filter(source__in=names):
+            found.setdefault(variant.source, []).append(variant)
+    for post in posts:
+        variants = found.get(post.image.name) if post.image else None
+        post.__dict__['responsive_image'] = (
+            ResponsiveImage(variants) if variants else None)
+
+
+def responsive_image(post):
+    if 'responsive_image' not in post.__dict__:
+        prefetch_variants([post])
+    return post.responsive_image
@@ -1,75 +1,120 @@
+import mimetypes
+
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponseRedirect
-from django.urls import reverse
+from django.core.exceptions import PermissionDenied, SuspiciousFileOperation
+from django.core.files.storage import default_storage
 from django.core.paginator import Paginator
+from django.http import (FileResponse, Http404, HttpResponseRedirect,
+                         JsonResponse, StreamingHttpResponse)
+from django.utils.cache import get_conditional_response
+from django.urls import reverse
 from .models import Post, Group, Follow
 from django.contrib.auth import get_user_model
 from .forms import PostForm, CommentForm
 from django.template import RequestContext
 from django.contrib.auth.decorators import login_required
+from core.db import retry_on_busy
+from . import (autocomplete, counters, export, pagecache, resize,
+               thumbnails, timeline)
+from .paginators import POSTS_PER_PAGE, paginate
+from .search import SearchResults
+from .uploads import image_uploads
 
 User = get_user_model()
 
 
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    pagecache.depends_on(request, pagecache.GLOBAL)
+    post_list = Post.objects.for_feed()
+    page_obj = paginate(request, post_list, counters.GLOBAL)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+def page_dates(page_obj):
+    return [post.modified for post in page_obj.object_list]
+
+
 def group_list(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    response = pagecache.not_modified(request, pagecache.group_ns(group.pk))
+    if response is not None:
+        return response
+    pagecache.depends_on(request, pagecache.group_ns(group.pk))
+    posts = group.posts.for_feed()
+    page_obj = paginate(request, posts, counters.group_key(group.pk))
     context = {
         'group': group,
         'page_obj': page_obj,
     }
-    return render(request, 'posts/group_list.html', context)
+    response = render(request, 'posts/group_list.html', context)
+    return pagecache.validated(request, response, page_dates(page_obj))
 
 
 def profile(request, username):
     author = get_object_or_404(User, username=username)
+    response = pagecache.not_modified(request, pagecache.author_ns(author.pk))
+    if response is not None:
+        return response
+    pagecache.depends_on(request, pagecache.author_ns(author.pk))
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author).exists()
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = author.posts.for_feed()
+    page_obj = paginate(request, post_list, counters.author_key(author.pk))
     context = {
         'page_obj': page_obj,
         'author': author,
         'following': following,
     }
-    return render(request, 'posts/profile.html', context)
+    response = render(request, 'posts/profile.html', context)
+    return pagecache.validated(request, response, page_dates(page_obj))
 
 
 def post_detail(request, post_id):
+    # Автор поста не меняется; зная его из кэша, можно ответить 304
+    # без единого запроса.
+    author_id = pagecache.post_author(post_id)
+    if author_id is not None:
+        response = pagecache.not_modified(request, pagecache.post_ns(post_id),
+                                          pagecache.author_ns(author_id))
+        if response is not None:
+            return response
     form = CommentForm(request.POST or None)
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.for_detail(), pk=post_id)
+    pagecache.depends_on(request, pagecache.post_ns(post.pk),
+                         pagecache.author_ns(post.author_id))
+    if author_id is None:
+        pagecache.remember_post_author(post)
+        # Без ETag первый ответ ушел бы клиенту и в кэш страниц без
+        # валидаторов.
+        response = pagecache.not_modified(
+            request, pagecache.post_ns(post.pk),
+            pagecache.author_ns(post.author_id))
+        if response is not None:
+            return response
     comments = post.comments.all()
     context = {
         'post': post,
         'form': form,
         'comments': comments
     }
-    return render(request, 'posts/post_detail.html', context)
+    response = render(request, 'posts/post_detail.html', context)
+    return pagecache.validated(request, response, [post.modified] + [
+        comment.created for comment in comments])
 
 
 @login_required(redirect_field_name='')
+@image_uploads
 def post_create(request):
-    form = PostForm(request.POST or None, files=request.FILES or None,)
+    form = PostForm(request.POST or None, files=request.FILES or None,
+                    user=request.user)
     if form.is_valid():
         new_post = form.save(commit=False)
         new_post.author = request.user
         new_post.save()
+        thumbnails.queue(new_post)
         return HttpResponseRedirect(reverse('posts:profile',
                                     args=[request.user]))
     context = {
@@ -79,6 +124,7 @@ def post_create(request):
 
 
 @login_required
+@image_uploads
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if request.user != post.author:
@@ -86,10 +132,13 @@ def post_edit(request, post_id):
                                     args=[post_id]))
     form = PostForm(request.POST or None,
                     files=request.FILES or None,
-                    instance=post
+                    instance=post,
+                    user=request.user,
                     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.queue(post)
         return HttpResponseRedirect(reverse('posts:post_detail',
                                     args=[post_id]))
     context = {
@@ -102,6 +151,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@retry_on_busy
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -115,18 +165,17 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    # Число постов ленты считает сама timeline.Feed по счетчикам.
+    page = paginate(request, timeline.feed(request.user).for_feed())
     context = {
-        'paginator': paginator,
+        'paginator': page.paginator,
         'page_obj': page
     }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@retry_on_busy
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
@@ -135,7 +184,92 @@ def profile_follow(request, username):
 
 
 @login_required
+@retry_on_busy
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    filters = {}
+    for name in ('author', 'group'):
+        value = request.GET.get(name, '')
+        if value.isdigit():
+            filters[f'{name}_id'] = int(value)
+    results = SearchResults(query, **filters)
+    page_obj = Paginator(results, POSTS_PER_PAGE).get_page(
+        request.GET.get('page'))
+    authors = dict(results.facet('author_id'))
+    groups = dict(results.facet('group_id'))
+    page_query = request.GET.copy()
+    page_query.pop('page', None)
+    context = {
+        'query': query,
+        'filters': filters,
+        'page_obj': page_obj,
+        'page_query': page_query.urlencode() + '&' if page_query else '',
+        'authors': [
+            (user, authors[user.pk])
+            for user in User.objects.filter(pk__in=authors).order_by(
+                'username')],
+        'groups': [
+            (group, groups[group.pk])
+            for group in Group.objects.filter(pk__in=groups).order_by(
+                'title')],
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def suggest(request):
+    results = autocomplete.get_index().suggest(request.GET.get('q', ''))
+    return JsonResponse({'results': results})
+
+
+def resize_image(request, signed, name):
+    params = resize.unsign(signed, name)
+    if params is None:
+        raise Http404
+    etag = resize.etag(params, name)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            target = resize.resize(params, name)
+        except (OSError, SuspiciousFileOperation):
+            raise Http404
+        content_type, _ = mimetypes.guess_type(target)
+        response = FileResponse(default_storage.open(target),
+                                content_type=content_type)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+def export_response(request, queryset, filename):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in export.FORMATS:
+        raise Http404
+    content_type, extension = export.FORMATS[export_format]
+    response = StreamingHttpResponse(
+        export.chunks(queryset, export_format), content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="{filename}.{extension}"')
+    return response
+
+
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user and not request.user.is_staff:
+        raise PermissionDenied
+    return export_response(request, author.posts.all(),
+                           f'posts-{author.username}')
+
+
+@login_required
+def group_export(request, slug):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    group = get_object_or_404(Group, slug=slug)
+    return export_response(request, group.posts.all(), f'posts-{group.slug}')
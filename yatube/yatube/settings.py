@@ -25,6 +25,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
+    'core.routers.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -61,6 +63,27 @@ DATABASES = {
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
+# Поверх core.db.DEFAULT_PRAGMAS; None отключает прагму.
+SQLITE_PRAGMAS = {}
+SQLITE_BUSY_ATTEMPTS = 3
+
+# Реплики для чтения лент: копии db.sqlite3, которые обновляет
+# manage.py sync_replicas. Файл открывается как неизменяемый, поэтому
+# копия подменяется целиком, а не дописывается.
+DATABASE_REPLICAS = [
+    f'replica{number}' for number in
+    range(1, int(os.environ.get('YATUBE_DB_REPLICAS', 0)) + 1)
+]
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'file:{}?immutable=1'.format(
+            os.path.join(BASE_DIR, f'db.{alias}.sqlite3')),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи пользователь читает с основной базы.
+REPLICA_STICKY_SECONDS = 10
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -79,7 +102,12 @@ AUTH_PASSWORD_VALIDATORS = [
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.sqlite.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
 
@@ -102,3 +130,17 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+POSTS_CURSOR_PAGINATION = False
+POSTS_FANOUT_LIMIT = 1000
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_TIMEOUT = 600
+POST_CARD_TIMEOUT = 60 * 60 * 24
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+THUMBNAIL_PREGENERATE = 'async'
+THUMBNAIL_WORKERS = 2
+POST_IMAGE_MAX_SIZE = 20 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_QUOTA = 500 * 1024 * 1024
+POST_RESIZE_GEOMETRIES = ('200x200-crop', '320x240', '640x480', '1280x720')
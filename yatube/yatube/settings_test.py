@@ -0,0 +1,13 @@
+"""Настройки для тестов: manage.py test и pytest подключают их сами."""
+from .settings import *  # noqa: F401,F403
+
+# Кэш в памяти процесса: тесты не видят файлов кэша прошлых запусков.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+# Тесты страниц включают кэш сами через override_settings.
+PAGE_CACHE_ENABLED = False
+# Без пула процессов; on_commit в TestCase все равно не срабатывает.
+THUMBNAIL_PREGENERATE = 'sync'
@@ -12,7 +12,7 @@ urlpatterns = [
 ]
 
 handler404 = 'core.views.page_not_found'
-handler403 = 'core.views.csrf_failure'
+handler403 = 'core.views.permission_denied'
 handler500 = 'core.views.server_error'
 
 if settings.DEBUG:
@@ -5,3 +5,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Индекс подсказок строится секунды; пусть это случится до первого запроса.
+from posts import autocomplete  # noqa: E402
+
+autocomplete.warm_up()